@@ -0,0 +1,64 @@
+import time
+
+from django.core.cache import cache
+
+# Сколько держать блокировку пересчёта, если вычисление упало молча.
+LOCK_TIMEOUT = 30
+# Сколько ждать чужого пересчёта, когда отдать нечего.
+WAIT_TIMEOUT = 5
+POLL_INTERVAL = 0.05
+# Сколько устаревшее значение ещё можно отдавать, пока идёт пересчёт.
+STALE_TIMEOUT = 60
+
+
+def store(key, value, timeout, stale_timeout=STALE_TIMEOUT):
+    """Кладёт значение в формате single_flight: (свежо до, значение)."""
+    if timeout is None:
+        cache.set(key, (None, value), None)
+    else:
+        cache.set(
+            key, (time.time() + timeout, value), timeout + stale_timeout
+        )
+
+
+def is_fresh(entry):
+    fresh_until, _ = entry
+    return fresh_until is None or time.time() < fresh_until
+
+
+def single_flight(key, compute, timeout, keep=None,
+                  stale_timeout=STALE_TIMEOUT, lock_timeout=LOCK_TIMEOUT,
+                  wait=WAIT_TIMEOUT):
+    """
+    Значение из кеша по ключу key, при промахе — compute().
+    Одновременные промахи по одному ключу вычисляют значение один раз:
+    пересчитывает тот, кто взял блокировку, остальные получают
+    устаревшее значение, а если его нет — ждут до wait секунд.
+    keep(value) решает, класть ли вычисленное значение в кеш.
+    """
+    entry = cache.get(key)
+    if entry is not None and is_fresh(entry):
+        return entry[1]
+    lock = f'{key}:lock'
+    if cache.add(lock, True, lock_timeout):
+        try:
+            fresh = cache.get(key)
+            if fresh is not None and is_fresh(fresh):
+                return fresh[1]
+            value = compute()
+            if keep is None or keep(value):
+                store(key, value, timeout, stale_timeout)
+            return value
+        finally:
+            cache.delete(lock)
+    if entry is not None:
+        return entry[1]
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[1]
+        if cache.get(lock) is None:
+            break
+    return compute()
@@ -0,0 +1,523 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.signals import request_started
+
+# Как часто подрезать журнал изменений: раз в столько записей в него.
+CHANGES_TRIM_EVERY = 100
+# Сколько ключей перечислять в одном IN (...): старые сборки SQLite
+# принимают не больше 999 параметров в запросе.
+KEYS_PER_QUERY = 500
+# Состояние кеша в процессе по LOCATION. Django создаёт экземпляр
+# бэкенда на каждый поток, а LRU и позиция в журнале общие для процесса.
+_states = {}
+_states_lock = threading.Lock()
+
+
+def chunked(keys):
+    """Список keys порциями по KEYS_PER_QUERY для запросов с IN (...)."""
+    return [
+        keys[start:start + KEYS_PER_QUERY]
+        for start in range(0, len(keys), KEYS_PER_QUERY)
+    ]
+
+
+class SQLiteStore:
+    """
+    Общее для всех процессов хранилище ключ-значение в файле SQLite.
+    add и incr выполняются в одной транзакции и потому атомарны
+    между процессами: на них держатся блокировки и счётчики версий.
+
+    Изменения ключей, перечисленных в logged, в той же транзакции
+    пишутся в журнал changes. Методы записи возвращают номер записи
+    журнала, по нему процессы узнают, какие локальные копии устарели.
+    """
+
+    def __init__(self, path, max_entries, cull_frequency, changes_size):
+        self.path = path
+        self.max_entries = max_entries
+        self.cull_frequency = cull_frequency
+        self.changes_size = changes_size
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            # key NULL — сброс всего кеша.
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS changes ('
+                'seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def transaction(self):
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        return connection
+
+    @staticmethod
+    def _alive(row, now):
+        return row is not None and (row[1] is None or row[1] > now)
+
+    def _log(self, connection, keys):
+        """Пишет ключи в журнал. Возвращает номер последней записи."""
+        seq = None
+        for key in keys:
+            seq = connection.execute(
+                'INSERT INTO changes (key) VALUES (?)', [key]
+            ).lastrowid
+        if seq is not None and seq % CHANGES_TRIM_EVERY == 0:
+            connection.execute(
+                'DELETE FROM changes WHERE seq <= ?',
+                [seq - self.changes_size]
+            )
+        return seq
+
+    def changes_since(self, seen):
+        """
+        Изменения после записи seen: (последний номер, ключи, полнота).
+        Полноты нет, если нужные записи уже подрезаны, журнал начат
+        заново или кеш очищен целиком — тогда верить нельзя ничему.
+        """
+        rows = self.connection.execute(
+            'SELECT seq, key FROM changes WHERE seq > ? '
+            'OR seq = (SELECT max(seq) FROM changes) ORDER BY seq',
+            [seen or 0]
+        ).fetchall()
+        last = rows[-1][0] if rows else 0
+        if seen is None:
+            return last, [], True
+        if last < seen:
+            return last, [], False
+        rows = [row for row in rows if row[0] > seen]
+        complete = not rows or (
+            rows[0][0] == seen + 1
+            and all(key is not None for _, key in rows)
+        )
+        return last, rows, complete
+
+    def get_many(self, keys):
+        """Словарь ключ -> (pickle значения, срок) для живых ключей."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        now = time.time()
+        found = {}
+        for chunk in chunked(keys):
+            rows = self.connection.execute(
+                'SELECT key, value, expires FROM cache '
+                'WHERE key IN ({})'.format(','.join('?' * len(chunk))),
+                chunk
+            ).fetchall()
+            found.update(
+                (key, (value, expires)) for key, value, expires in rows
+                if expires is None or expires > now
+            )
+        return found
+
+    def set(self, key, value, expires, logged=True):
+        """Записывает значение. Возвращает номер записи журнала."""
+        connection = self.transaction()
+        try:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)',
+                [key, value, expires]
+            )
+            seq = self._log(connection, [key] if logged else [])
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._maybe_cull()
+        return seq
+
+    def add(self, key, value, expires, logged=True):
+        """
+        Записывает значение, только если ключа нет или он истёк.
+        Возвращает номер записи журнала или None, если ключ занят.
+        """
+        connection = self.transaction()
+        try:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', [key]
+            ).fetchone()
+            added = not self._alive(row, time.time())
+            seq = None
+            if added:
+                connection.execute(
+                    'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)',
+                    [key, value, expires]
+                )
+                seq = self._log(connection, [key] if logged else []) or 0
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return seq
+
+    def incr(self, key, delta, logged=True):
+        """Атомарно меняет число под ключом. Возвращает None без ключа."""
+        connection = self.transaction()
+        try:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', [key]
+            ).fetchone()
+            if not self._alive(row, time.time()):
+                connection.execute('COMMIT')
+                return None
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                [pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key]
+            )
+            self._log(connection, [key] if logged else [])
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return value
+
+    def touch(self, key, expires):
+        cursor = self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [expires, key, time.time()]
+        )
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, logged=()):
+        """Удаляет ключи. Возвращает, сколько живых ключей удалено."""
+        keys = list(keys)
+        if not keys:
+            return 0
+        deleted = 0
+        now = time.time()
+        connection = self.transaction()
+        try:
+            for chunk in chunked(keys):
+                deleted += connection.execute(
+                    'DELETE FROM cache WHERE key IN ({}) '
+                    'AND (expires IS NULL OR expires > ?)'.format(
+                        ','.join('?' * len(chunk))
+                    ), chunk + [now]
+                ).rowcount
+            # Журналируются и уже истёкшие ключи: их копии в памяти
+            # других процессов могли пережить вытеснение из файла.
+            self._log(connection, logged)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return deleted
+
+    def clear(self):
+        connection = self.transaction()
+        try:
+            connection.execute('DELETE FROM cache')
+            connection.execute('DELETE FROM changes')
+            self._log(connection, [None])
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _maybe_cull(self):
+        # Как у FileBasedCache: при переполнении сначала убираем
+        # истёкшие ключи, затем каждый cull_frequency-й из самых старых.
+        connection = self.connection
+        count = connection.execute('SELECT count(*) FROM cache').fetchone()[0]
+        if count <= self.max_entries:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            [time.time()]
+        )
+        count = connection.execute('SELECT count(*) FROM cache').fetchone()[0]
+        if count > self.max_entries and self.cull_frequency:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                [count // self.cull_frequency]
+            )
+
+
+class LocalLRU:
+    """
+    Ограниченный по числу ключей и объёму LRU в памяти процесса.
+    Значения хранятся в pickle: каждый get отдаёт свою копию объекта.
+    Каждая копия помнит номер записи журнала, на момент которой
+    она верна: более поздние изменения её ключа её вытесняют.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires, _ = entry
+            if expires <= now:
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires, seq):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, expires, seq)
+            self.size += len(value)
+            while (
+                len(self._data) > self.max_entries
+                or self.size > self.max_bytes
+            ):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def discard(self, changes):
+        """Вытесняет копии, устаревшие из-за изменений (seq, key)."""
+        with self._lock:
+            for seq, key in changes:
+                entry = self._data.get(key)
+                if entry is not None and entry[2] < seq:
+                    self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+
+class ProcessState:
+    """LRU процесса и последняя прочитанная запись журнала изменений."""
+
+    def __init__(self, store, local):
+        self.store = store
+        self.local = local
+        self.seen = None
+        self.synced_at = 0
+        self.lock = threading.Lock()
+
+
+def process_state(location, factory):
+    with _states_lock:
+        state = _states.get(location)
+        if state is None or state.pid != os.getpid():
+            state = factory()
+            state.pid = os.getpid()
+            _states[location] = state
+        return state
+
+
+def request_started_sync(**kwargs):
+    """В начале запроса каждый кеш сверяется с журналом заново."""
+    for state in list(_states.values()):
+        state.synced_at = 0
+
+
+request_started.connect(request_started_sync)
+
+
+class TwoTierCache(BaseCache):
+    """
+    Кеш из двух уровней: LRU в памяти процесса поверх общего для всех
+    воркеров файла SQLite (LOCATION).
+
+    Записи идут в общий файл, а изменённые ключи — в журнал изменений
+    в той же транзакции. Процесс читает новые записи журнала в начале
+    каждого запроса и не реже раза в SYNC_INTERVAL секунд и вытесняет
+    из памяти только изменённые ключи. Так горячие ключи читаются
+    из памяти, пока их не поменяли, а изменения из других воркеров
+    видны со следующего запроса. Если процесс отстал дальше, чем
+    хранится журнал, или кеш очищен целиком, память сбрасывается.
+
+    OPTIONS:
+    LOCAL_MAX_ENTRIES, LOCAL_MAX_BYTES — размер LRU в памяти;
+    LOCAL_TIMEOUT — сколько секунд держать ключ в памяти;
+    SYNC_INTERVAL — как часто читать журнал вне запросов;
+    CHANGES_SIZE — сколько последних изменений хранит журнал;
+    SHARED_ONLY_SUFFIXES — ключи, которые не кешируются в памяти
+    и не пишутся в журнал (блокировки single_flight).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.state = process_state(location, lambda: ProcessState(
+            SQLiteStore(
+                location, self._max_entries, self._cull_frequency,
+                options.get('CHANGES_SIZE', 10000),
+            ),
+            LocalLRU(
+                options.get('LOCAL_MAX_ENTRIES', 1000),
+                options.get('LOCAL_MAX_BYTES', 32 * 1024 * 1024),
+            ),
+        ))
+        self.store = self.state.store
+        self.local = self.state.local
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+        self.shared_only_suffixes = tuple(
+            options.get('SHARED_ONLY_SUFFIXES', (':lock',))
+        )
+
+    def _is_local(self, key):
+        return not key.endswith(self.shared_only_suffixes)
+
+    def sync(self):
+        """
+        Вытесняет из памяти ключи, изменённые другими процессами.
+        Журнал читается не чаще SYNC_INTERVAL. Возвращает номер
+        последней прочитанной записи журнала.
+        """
+        state = self.state
+        with state.lock:
+            now = time.monotonic()
+            if state.seen is not None and now - state.synced_at < (
+                self.sync_interval
+            ):
+                return state.seen
+            seen, changes, complete = self.store.changes_since(state.seen)
+            if complete:
+                self.local.discard(changes)
+            else:
+                self.local.clear()
+            state.seen = seen
+            state.synced_at = now
+            return seen
+
+    @staticmethod
+    def _dumps(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _remember(self, key, value, expires, seq):
+        """
+        Кладёт копию, верную на момент записи журнала seq. Если журнал
+        уже прочитан дальше seq, более позднее изменение ключа могло
+        пройти мимо этой копии, и она не запоминается.
+        """
+        if not self._is_local(key) or seq is None:
+            return
+        local_expires = time.time() + self.local_timeout
+        if expires is not None:
+            local_expires = min(local_expires, expires)
+        with self.state.lock:
+            if self.state.seen is not None and self.state.seen > seq:
+                return
+            self.local.set(key, value, local_expires, seq)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            made[made_key] = key
+        result = {}
+        missing = []
+        seen = self.sync()
+        for made_key, key in made.items():
+            value = None
+            if self._is_local(made_key):
+                value = self.local.get(made_key)
+            if value is None:
+                missing.append(made_key)
+            else:
+                result[key] = pickle.loads(value)
+        if not missing:
+            return result
+        for made_key, (value, expires) in self.store.get_many(
+            missing
+        ).items():
+            self._remember(made_key, value, expires, seen)
+            result[made[made_key]] = pickle.loads(value)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value, expires = self._dumps(value), self.get_backend_timeout(timeout)
+        self.local.delete(key)
+        seq = self.store.set(key, value, expires, self._is_local(key))
+        self._remember(key, value, expires, seq)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value, expires = self._dumps(value), self.get_backend_timeout(timeout)
+        seq = self.store.add(key, value, expires, self._is_local(key))
+        self._remember(key, value, expires, seq)
+        return seq is not None
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        self.local.delete(made_key)
+        value = self.store.incr(made_key, delta, self._is_local(made_key))
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.local.delete(key)
+        return self.store.touch(key, self.get_backend_timeout(timeout))
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made = []
+        for key in keys:
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            self.local.delete(key)
+            made.append(key)
+        self.store.delete_many(
+            made, [key for key in made if self._is_local(key)]
+        )
+
+    def has_key(self, key, version=None):
+        return key in self.get_many([key], version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.store.clear()
@@ -0,0 +1,112 @@
+import mimetypes
+import os
+import posixpath
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views import static
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts.storage import HASHED_NAME
+
+# Кто отдаёт файлы: 'nginx' (X-Accel-Redirect), 'apache' (X-Sendfile)
+# или None — сам Django, только для разработки.
+MEDIA_SENDFILE_BACKEND = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+# internal-location nginx, смотрящий в MEDIA_ROOT.
+MEDIA_ACCEL_PREFIX = getattr(
+    settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/'
+)
+# Оригиналы с хешем содержимого в имени и миниатюры sorl к ним
+# не меняются, их кешируем на год.
+MEDIA_IMMUTABLE_MAX_AGE = getattr(
+    settings, 'MEDIA_IMMUTABLE_MAX_AGE', 60 * 60 * 24 * 365
+)
+MEDIA_MAX_AGE = getattr(settings, 'MEDIA_MAX_AGE', 60 * 60 * 24)
+
+
+def media_path(path):
+    """
+    Путь к файлу внутри MEDIA_ROOT. Выход за MEDIA_ROOT, скрытые
+    файлы и каталоги считаются отсутствующими.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except ValueError:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    return path, fullpath
+
+
+def is_immutable(path):
+    """Файл никогда не перезаписывается под тем же именем."""
+    return bool(HASHED_NAME.match(path)) or path.startswith(
+        sorl_settings.THUMBNAIL_PREFIX
+    )
+
+
+def media_etag(path, stat):
+    """ETag по хешу из имени файла, а для прочих — по размеру и mtime."""
+    if HASHED_NAME.match(path):
+        return quote_etag(posixpath.splitext(posixpath.basename(path))[0])
+    return quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+
+
+def offload(response, path, fullpath):
+    """Передаёт отдачу файла фронт-прокси заголовком бэкенда."""
+    if MEDIA_SENDFILE_BACKEND == 'nginx':
+        response['X-Accel-Redirect'] = posixpath.join(
+            MEDIA_ACCEL_PREFIX, quote(path)
+        )
+    elif MEDIA_SENDFILE_BACKEND == 'apache':
+        response['X-Sendfile'] = fullpath
+    else:
+        raise ImproperlyConfigured(
+            f'Неизвестный MEDIA_SENDFILE_BACKEND: {MEDIA_SENDFILE_BACKEND!r}'
+        )
+
+
+def serve_media(request, path):
+    """
+    Отдаёт файл из MEDIA_ROOT. Django только проверяет путь и ставит
+    заголовки кеширования, а байты шлёт фронт-прокси (он же отвечает
+    на Range), так что воркеры не заняты передачей картинок.
+    Без MEDIA_SENDFILE_BACKEND файл отдаёт сам Django.
+    """
+    path, fullpath = media_path(path)
+    if not MEDIA_SENDFILE_BACKEND:
+        return static.serve(
+            request, path, document_root=settings.MEDIA_ROOT
+        )
+    stat = os.stat(fullpath)
+    etag = media_etag(path, stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = HttpResponse()
+        content_type, _ = mimetypes.guess_type(fullpath)
+        response['Content-Type'] = (
+            content_type or 'application/octet-stream'
+        )
+        response['Accept-Ranges'] = 'bytes'
+        offload(response, path, fullpath)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if is_immutable(path):
+        patch_cache_control(
+            response, public=True, immutable=True,
+            max_age=MEDIA_IMMUTABLE_MAX_AGE
+        )
+    else:
+        patch_cache_control(response, public=True, max_age=MEDIA_MAX_AGE)
+    return response
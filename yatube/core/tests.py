@@ -0,0 +1,215 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.signals import request_started
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from . import media
+from .cache_backends import TwoTierCache
+
+TEMP_DIR = tempfile.mkdtemp()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_cache(name='cache', **options):
+    return TwoTierCache(
+        os.path.join(TEMP_DIR, f'{name}.sqlite3'), {'OPTIONS': options}
+    )
+
+
+def change_in_other_worker(location):
+    """Запускается в отдельном процессе, как другой воркер gunicorn."""
+    cache = TwoTierCache(location, {})
+    cache.set('hot', 'новое')
+    cache.incr('version')
+    cache.delete('gone')
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.cache = make_cache()
+        self.cache.clear()
+
+    def test_hot_key_served_from_memory(self):
+        """Повторное чтение горячего ключа не ходит в общий файл."""
+        self.cache.set('hot', {'значение': 1})
+        self.cache.get('hot')
+        with mock.patch.object(
+            self.cache.store, 'get_many', wraps=self.cache.store.get_many
+        ) as get_many:
+            value = self.cache.get('hot')
+            value['значение'] = 2
+            self.assertEqual(self.cache.get('hot'), {'значение': 1})
+        get_many.assert_not_called()
+
+    def test_other_worker_changes_are_seen(self):
+        """Изменения из другого процесса видны со следующего запроса."""
+        self.cache.set('hot', 'старое')
+        self.cache.set('version', 1)
+        self.cache.set('gone', 'есть')
+        for key in ('hot', 'version', 'gone'):
+            self.cache.get(key)
+        worker = multiprocessing.get_context('fork').Process(
+            target=change_in_other_worker, args=[self.cache.store.path]
+        )
+        worker.start()
+        worker.join()
+        self.assertEqual(worker.exitcode, 0)
+        request_started.send(sender=None)
+        self.assertEqual(self.cache.get('hot'), 'новое')
+        self.assertEqual(self.cache.get('version'), 2)
+        self.assertIsNone(self.cache.get('gone'))
+
+    def test_changes_evict_only_changed_keys(self):
+        """Чужие изменения вытесняют из памяти только свои ключи."""
+        self.cache.set('hot', 'старое')
+        self.cache.set('cold', 'холодное')
+        self.cache.get('hot')
+        worker = multiprocessing.get_context('fork').Process(
+            target=change_in_other_worker, args=[self.cache.store.path]
+        )
+        self.cache.set('version', 1)
+        worker.start()
+        worker.join()
+        request_started.send(sender=None)
+        with mock.patch.object(
+            self.cache.store, 'get_many', wraps=self.cache.store.get_many
+        ) as get_many:
+            self.assertEqual(self.cache.get('cold'), 'холодное')
+            get_many.assert_not_called()
+            self.assertEqual(self.cache.get('hot'), 'новое')
+            get_many.assert_called_once()
+
+    def test_stale_process_drops_local_tier(self):
+        """Отставший дальше журнала процесс сбрасывает память целиком."""
+        cache = make_cache('trimmed', CHANGES_SIZE=5)
+        cache.clear()
+        cache.set('cold', 'холодное')
+        cache.get('cold')
+        seen = cache.state.seen
+        for i in range(200):
+            cache.set(f'key{i}', i)
+        cache.state.seen = seen
+        request_started.send(sender=None)
+        cache.get('missing')
+        self.assertNotIn(cache.make_key('cold'), cache.local._data)
+
+    def test_local_tier_is_bounded(self):
+        """LRU в памяти ограничен числом ключей, объёмом и сроком."""
+        cache = make_cache(
+            'bounded', LOCAL_MAX_ENTRIES=2, LOCAL_MAX_BYTES=1000
+        )
+        cache.clear()
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        self.assertEqual(list(cache.local._data), [
+            cache.make_key('b'), cache.make_key('c')
+        ])
+        cache.set('big', 'x' * 2000)
+        self.assertNotIn(cache.make_key('big'), cache.local._data)
+        self.assertEqual(cache.get('big'), 'x' * 2000)
+        cache.set('short', 'значение', timeout=-1)
+        self.assertIsNone(cache.get('short'))
+
+    def test_add_is_atomic(self):
+        """Из одновременных add по одному ключу успешен ровно один."""
+        threads = 10
+        barrier = threading.Barrier(threads)
+
+        def add(_):
+            barrier.wait()
+            return make_cache().add('lock', True)
+
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(add, range(threads)))
+        self.assertEqual(results.count(True), 1)
+
+    def test_many_keys_split_into_queries(self):
+        """get_many и delete_many по многим ключам идут порциями."""
+        keys = [f'key{i}' for i in range(5)]
+        made = [self.cache.make_key(key) for key in keys]
+        self.cache.set_many({key: key for key in keys})
+        with mock.patch('core.cache_backends.KEYS_PER_QUERY', 2):
+            self.assertEqual(self.cache.store.get_many(made).keys(), set(made))
+            self.cache.delete_many(keys)
+            self.assertEqual(self.cache.store.get_many(made), {})
+        self.assertEqual(self.cache.get_many(keys), {})
+
+    def test_incr_missing_key(self):
+        """incr отсутствующего ключа падает, как у других бэкендов."""
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaOffloadTests(SimpleTestCase):
+    hashed = 'posts/ab/cd/abcd' + '0' * 60 + '.jpg'
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        for name in (self.hashed, 'avatar.png', '.secret'):
+            fullpath = os.path.join(TEMP_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(fullpath), exist_ok=True)
+            with open(fullpath, 'wb') as file:
+                file.write(b'image')
+        self.factory = RequestFactory()
+
+    def serve(self, path, backend='nginx', **headers):
+        request = self.factory.get(f'/media/{path}', **headers)
+        with mock.patch.object(media, 'MEDIA_SENDFILE_BACKEND', backend):
+            return media.serve_media(request, path)
+
+    def test_nginx_gets_file_transfer(self):
+        """Байты отдаёт nginx, а Django ставит только заголовки."""
+        response = self.serve(self.hashed)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(
+            response['X-Accel-Redirect'], f'/protected-media/{self.hashed}'
+        )
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], '"abcd' + '0' * 60 + '"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_apache_gets_file_path(self):
+        """Для Apache в X-Sendfile уходит путь к файлу на диске."""
+        response = self.serve('avatar.png', backend='apache')
+        self.assertEqual(
+            response['X-Sendfile'], os.path.join(TEMP_MEDIA_ROOT, 'avatar.png')
+        )
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_revalidation_answers_not_modified(self):
+        """Запрос с тем же ETag получает 304 без передачи файла."""
+        etag = self.serve(self.hashed)['ETag']
+        response = self.serve(self.hashed, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.has_header('X-Accel-Redirect'))
+
+    def test_unsafe_paths_not_found(self):
+        """Пути за пределы MEDIA_ROOT и к скрытым файлам дают 404."""
+        for path in ('../tests.py', '.secret', 'posts/', 'missing.jpg'):
+            with self.subTest(path=path):
+                with self.assertRaises(Http404):
+                    self.serve(path)
+
+    def test_without_backend_django_serves_file(self):
+        """Без фронт-прокси файл отдаёт сам Django."""
+        response = self.serve('avatar.png', backend=None)
+        self.assertEqual(b''.join(response.streaming_content), b'image')
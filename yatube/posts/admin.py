@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Group, Post, Follow, Comment
+from .models import Group, Post, Follow, Comment, GroupSubscription
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -36,7 +36,15 @@ class FollowAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class GroupSubscriptionAdmin(admin.ModelAdmin):
+
+    list_display = ('user', 'group',)
+    list_filter = ('group',)
+    empty_value_display = '-пусто-'
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Follow, FollowAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(GroupSubscription, GroupSubscriptionAdmin)
@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import install_triggers
+        from .thumbnails import generate_pending
+        from .timeline import backfill_pending
+        post_migrate.connect(install_triggers, sender=self)
+        request_finished.connect(generate_pending)
+        request_finished.connect(backfill_pending)
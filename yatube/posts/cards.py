@@ -0,0 +1,91 @@
+from django.db import transaction
+
+from .models import Post, PostCard
+
+# Поля карточки, которые копируются из поста как есть.
+POST_FIELDS = (
+    'author_id', 'group_id', 'pub_date', 'text', 'image',
+    'thumbnail_url', 'thumbnail_width', 'thumbnail_height',
+    'thumbnail_srcset',
+)
+CARD_KEYSET_FIELDS = ('pub_date', 'post')
+BATCH_SIZE = 500
+
+
+def card_for(post):
+    """Строка PostCard для поста с загруженными автором и группой."""
+    card = PostCard(post_id=post.pk)
+    for field in POST_FIELDS:
+        setattr(card, field, getattr(post, field))
+    card.author_username = post.author_username
+    card.author_full_name = post.author_full_name
+    card.group_slug = post.group_slug
+    card.group_title = post.group_title
+    return card
+
+
+def save_card(post):
+    """Создаёт или обновляет карточку поста."""
+    card_for(post).save()
+
+
+def create_cards(posts):
+    """
+    Карточки для пачки постов, например после bulk_create.
+    Возвращает pk постов, для которых собраны карточки.
+    """
+    posts = Post.objects.for_feed().filter(
+        pk__in=[post.pk for post in posts]
+    )
+    cards = [card_for(post) for post in posts]
+    PostCard.objects.bulk_create(
+        cards, batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    return [card.post_id for card in cards]
+
+
+def create_missing_cards(author_ids):
+    """
+    Карточки постов авторов, у которых их ещё нет. Нужна после
+    bulk_create на SQLite: там созданные посты приходят без pk.
+    Возвращает pk постов, получивших карточки.
+    """
+    return create_cards(Post.objects.filter(
+        author_id__in=author_ids, card__isnull=True
+    ))
+
+
+def update_author(user):
+    """Переписывает имя автора на всех его карточках."""
+    PostCard.objects.filter(author=user).exclude(
+        author_username=user.username,
+        author_full_name=user.get_full_name(),
+    ).update(
+        author_username=user.username,
+        author_full_name=user.get_full_name(),
+    )
+
+
+def update_group(group):
+    PostCard.objects.filter(group=group).update(
+        group_slug=group.slug, group_title=group.title
+    )
+
+
+def clear_group(group):
+    """Убирает удаляемую группу с карточек до того, как их отвяжут."""
+    PostCard.objects.filter(group=group).update(group_slug='', group_title='')
+
+
+def rebuild():
+    """Пересоздаёт все карточки по постам."""
+    with transaction.atomic():
+        PostCard.objects.all().delete()
+        posts = Post.objects.for_feed().order_by('pk')
+        cards = []
+        for post in posts.iterator():
+            cards.append(card_for(post))
+            if len(cards) == BATCH_SIZE:
+                PostCard.objects.bulk_create(cards)
+                cards = []
+        PostCard.objects.bulk_create(cards)
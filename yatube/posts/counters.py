@@ -0,0 +1,104 @@
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .lookups import forget_groups, forget_posts, forget_users
+from .models import Group, Post, User, UserCounters
+
+
+def _change(name, delta):
+    """
+    F(name) + delta. Уменьшение не уводит счётчик ниже нуля, даже если
+    он разошёлся с данными: поля счётчиков беззнаковые.
+    """
+    if delta < 0:
+        return Greatest(F(name) + delta, 0)
+    return F(name) + delta
+
+
+def _increments(**deltas):
+    return {
+        name: _change(name, delta) for name, delta in deltas.items() if delta
+    }
+
+
+def change_user_counters(user_id, **deltas):
+    """
+    Атомарно меняет счётчики пользователя на deltas.
+    Строка счётчиков создаётся только при увеличении: при уменьшении
+    пользователь может удаляться каскадом вместе со своими счётчиками.
+    """
+    values = _increments(**deltas)
+    if not values:
+        return
+    updated = UserCounters.objects.filter(user_id=user_id).update(**values)
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        UserCounters.objects.get_or_create(user_id=user_id)
+        UserCounters.objects.filter(user_id=user_id).update(**values)
+    forget_users(user_id)
+
+
+def user_counters(user):
+    """Счётчики пользователя; для пользователя без строки — нулевые."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return UserCounters(user=user)
+
+
+def change_group_posts(group_id, delta):
+    if group_id and delta:
+        Group.objects.filter(pk=group_id).update(**_increments(
+            posts_count=delta
+        ))
+        forget_groups(group_id)
+
+
+def change_post_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(**_increments(
+        comments_count=delta
+    ))
+    forget_posts(post_id)
+
+
+def _count_of(queryset, field):
+    """Подзапрос с количеством строк queryset для OuterRef('pk')."""
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), 0)
+
+
+def count_all(get_model=apps.get_model):
+    """
+    Пересчитывает все счётчики по фактическим данным. get_model позволяет
+    вызывать пересчёт из миграции с её историческими моделями.
+    """
+    User = get_model(settings.AUTH_USER_MODEL)
+    UserCounters = get_model('posts', 'UserCounters')
+    Group = get_model('posts', 'Group')
+    Post = get_model('posts', 'Post')
+    Follow = get_model('posts', 'Follow')
+    Comment = get_model('posts', 'Comment')
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=pk) for pk in User.objects.filter(
+            counters__isnull=True
+        ).values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    UserCounters.objects.update(
+        posts_count=_count_of(Post.objects, 'author'),
+        followers_count=_count_of(Follow.objects, 'author'),
+        following_count=_count_of(Follow.objects, 'user'),
+    )
+    Group.objects.update(posts_count=_count_of(Post.objects, 'group'))
+    Post.objects.update(comments_count=_count_of(Comment.objects, 'post'))
+
+
+def rebuild():
+    """Пересчитывает все счётчики и сбрасывает их копии в кеше."""
+    count_all()
+    forget_users(*User.objects.values_list('pk', flat=True))
+    forget_groups(*Group.objects.values_list('pk', flat=True))
+    forget_posts(*Post.objects.values_list('pk', flat=True))
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import check_limits, normalize_image
 from .models import Post, Comment
 
 
@@ -8,6 +10,17 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def clean_image(self):
+        """
+        Новую картинку проверяем по лимитам, уменьшаем
+        и пересохраняем без EXIF.
+        """
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            check_limits(image)
+            return normalize_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,73 @@
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .forms import CommentForm
+from .models import Follow, GroupSubscription
+
+PLACEHOLDER = re.compile(r'<!--fragment:(\w+):([^>]*)-->')
+
+
+def following_context(request, username):
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author__username=username
+    ).exists()
+    return {'following': following}
+
+
+def subscribed_context(request, slug):
+    subscribed = request.user.is_authenticated and (
+        GroupSubscription.objects.filter(
+            user=request.user, group__slug=slug
+        ).exists()
+    )
+    return {'subscribed': subscribed}
+
+
+def comment_form_context(request, post_id):
+    return {'form': CommentForm()}
+
+
+# Фрагменты страниц, зависящие от пользователя:
+# имя -> (шаблон, функция с данными фрагмента или None).
+FRAGMENTS = {
+    'header': ('includes/header.html', None),
+    'follow_button': (
+        'posts/includes/follow_button.html', following_context
+    ),
+    'subscribe_button': (
+        'posts/includes/subscribe_button.html', subscribed_context
+    ),
+    'comment_form': (
+        'posts/includes/comment_form.html', comment_form_context
+    ),
+    'edit_button': ('posts/includes/edit_button.html', None),
+}
+
+
+def fragment_context(request, name, params):
+    """Параметры фрагмента вместе с данными, которые он запрашивает сам."""
+    _, get_context = FRAGMENTS[name]
+    context = dict(params)
+    if get_context is not None:
+        context.update(get_context(request, **params))
+    return context
+
+
+def placeholder(name, params):
+    """Метка на месте фрагмента в общем теле страницы."""
+    return mark_safe(f'<!--fragment:{name}:{urlencode(params)}-->')
+
+
+def fill_holes(request, content):
+    """Подставляет в тело страницы фрагменты текущего пользователя."""
+    def render(match):
+        name = match.group(1)
+        params = dict(parse_qsl(match.group(2)))
+        template = get_template(FRAGMENTS[name][0])
+        return template.render(
+            fragment_context(request, name, params), request
+        )
+    return PLACEHOLDER.sub(render, content)
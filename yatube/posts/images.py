@@ -0,0 +1,73 @@
+import os
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from . import post_settings
+
+
+def validate_image_size(image):
+    """
+    Валидатор поля image: новая загрузка не больше IMAGE_MAX_BYTES.
+    Проверяет и формы сайта, и админку; уже сохранённые файлы
+    не проверяются, чтобы старые посты можно было редактировать.
+    """
+    if getattr(image, '_committed', False):
+        return
+    limit = post_settings.IMAGE_MAX_BYTES
+    if image.size > limit:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='too_large',
+            params={'limit': limit // (1024 * 1024)},
+        )
+
+
+def check_limits(upload):
+    """
+    Проверяет размер файла и число пикселей до пересохранения: модель
+    увидит уже уменьшенный файл. Размеры берутся из заголовка, который
+    прочитала форма: пиксели к этому моменту не декодированы.
+    """
+    validate_image_size(upload)
+    width, height = upload.image.size
+    limit = post_settings.IMAGE_MAX_PIXELS
+    if width * height > limit:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': limit // 1_000_000},
+        )
+
+
+def normalize_image(upload):
+    """
+    Уменьшает картинку до IMAGE_MAX_SIDE по большей стороне,
+    поворачивает по EXIF и пересохраняет без метаданных:
+    с прозрачностью — в PNG, без неё — в JPEG.
+    """
+    max_side = post_settings.IMAGE_MAX_SIDE
+    upload.seek(0)
+    with Image.open(upload) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе.
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or (
+            image.mode == 'P' and 'transparency' in image.info
+        )
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = BytesIO()
+        if has_alpha:
+            image.save(buffer, 'PNG', optimize=True)
+            extension = '.png'
+        else:
+            image.save(
+                buffer, 'JPEG',
+                quality=post_settings.IMAGE_QUALITY, optimize=True
+            )
+            extension = '.jpg'
+    name = os.path.splitext(os.path.basename(upload.name))[0] + extension
+    return ContentFile(buffer.getvalue(), name=name)
@@ -0,0 +1,187 @@
+import copy
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import Http404
+
+from .models import Group, Post, User
+from .post_settings import LOOKUP_CACHE_TIMEOUT, MISSING_LOOKUP_TIMEOUT
+
+# Поля пользователя, которые нужны страницам. Остальные, включая хеш
+# пароля и email, в общий кеш на диске не попадают.
+USER_FIELDS = ('username', 'first_name', 'last_name')
+DEFERRED_USER_FIELDS = tuple(
+    field.name for field in User._meta.concrete_fields
+    if not field.primary_key and field.name not in USER_FIELDS
+)
+USERS = User.objects.select_related('counters').defer(*DEFERRED_USER_FIELDS)
+# Отметка в кеше: объекта с таким ключом нет.
+MISSING = 'missing'
+MAX_POST_ID_KEY = 'posts:lookup:max_post_id'
+
+
+def user_key(pk):
+    return f'posts:lookup:user:{pk}'
+
+
+def username_key(username):
+    return f'posts:lookup:username:{username}'
+
+
+def group_key(pk):
+    return f'posts:lookup:group:{pk}'
+
+
+def slug_key(slug):
+    return f'posts:lookup:slug:{slug}'
+
+
+def post_key(pk):
+    return f'posts:lookup:post:{pk}'
+
+
+def _get_or_404(key, queryset, **lookup):
+    """
+    get_object_or_404, который запоминает отсутствие объекта под key:
+    повторные запросы несуществующих адресов не доходят до базы.
+    """
+    try:
+        return queryset.get(**lookup)
+    except queryset.model.DoesNotExist:
+        cache.set(key, MISSING, MISSING_LOOKUP_TIMEOUT)
+        _raise_missing(queryset)
+
+
+def _raise_missing(queryset):
+    raise Http404(
+        f'No {queryset.model._meta.object_name} matches the given query.'
+    )
+
+
+def _by_natural_key(natural_key, object_key, queryset, field, value):
+    """
+    Объект по уникальному полю через кеш: поле -> pk -> объект.
+    Объект из кеша сверяется с полем, поэтому переименование
+    не отдаёт чужой объект по старому имени.
+    """
+    pk = cache.get(natural_key)
+    if pk == MISSING:
+        _raise_missing(queryset)
+    if pk is not None:
+        obj = cache.get(object_key(pk))
+        if obj is not None and getattr(obj, field) == value:
+            return obj
+    obj = _get_or_404(natural_key, queryset, **{field: value})
+    cache.set_many(
+        {natural_key: obj.pk, object_key(obj.pk): obj}, LOOKUP_CACHE_TIMEOUT
+    )
+    return obj
+
+
+def _by_pk(key, queryset, pk):
+    obj = cache.get(key)
+    if obj == MISSING:
+        _raise_missing(queryset)
+    if obj is None:
+        obj = _get_or_404(key, queryset, pk=pk)
+        cache.set(key, obj, LOOKUP_CACHE_TIMEOUT)
+    return obj
+
+
+def get_user_or_404(username):
+    """Пользователь со счётчиками по username."""
+    return _by_natural_key(
+        username_key(username), user_key, USERS, 'username', username
+    )
+
+
+def get_user_by_pk(pk):
+    return _by_pk(user_key(pk), USERS, pk)
+
+
+def get_group_or_404(slug):
+    return _by_natural_key(
+        slug_key(slug), group_key, Group.objects, 'slug', slug
+    )
+
+
+def get_group_by_pk(pk):
+    return _by_pk(group_key(pk), Group.objects, pk)
+
+
+def get_post_or_404(pk):
+    """
+    Пост с автором и группой. Автор и группа хранятся в своих
+    записях кеша, поэтому их правки не требуют сбрасывать посты.
+    id больше известного наибольшего отвечают 404 без запроса.
+    """
+    max_id = cache.get(MAX_POST_ID_KEY)
+    if max_id is not None and pk > max_id:
+        _raise_missing(Post.objects)
+    post = cache.get(post_key(pk))
+    if post == MISSING:
+        _raise_missing(Post.objects)
+    if post is None:
+        return _fetch_post(pk)
+    post.author = get_user_by_pk(post.author_id)
+    if post.group_id:
+        post.group = get_group_by_pk(post.group_id)
+    return post
+
+
+def _fetch_post(pk):
+    """Читает пост одним запросом и раскладывает его по записям кеша."""
+    try:
+        post = _get_or_404(
+            post_key(pk),
+            Post.objects.select_related('author__counters', 'group').defer(
+                *[f'author__{name}' for name in DEFERRED_USER_FIELDS]
+            ),
+            pk=pk
+        )
+    except Http404:
+        # Перебор id обычно идёт дальше — запоминаем, где посты кончаются.
+        remember_max_post_id()
+        raise
+    bare = copy.copy(post)
+    bare._state = copy.copy(post._state)
+    bare._state.fields_cache = {}
+    entries = {post_key(pk): bare, user_key(post.author_id): post.author}
+    if post.group_id:
+        entries[group_key(post.group_id)] = post.group
+    cache.set_many(entries, LOOKUP_CACHE_TIMEOUT)
+    return post
+
+
+def remember_max_post_id():
+    """
+    Запоминает наибольший id поста. Отметка живёт недолго: пост,
+    созданный во время подсчёта, иначе надолго остался бы за границей.
+    """
+    max_id = Post.objects.aggregate(max_id=Max('pk'))['max_id'] or 0
+    cache.set(MAX_POST_ID_KEY, max_id, MISSING_LOOKUP_TIMEOUT)
+    return max_id
+
+
+def forget_max_post_id():
+    cache.delete(MAX_POST_ID_KEY)
+
+
+def forget_usernames(*usernames):
+    cache.delete_many([username_key(username) for username in usernames])
+
+
+def forget_slugs(*slugs):
+    cache.delete_many([slug_key(slug) for slug in slugs])
+
+
+def forget_users(*pks):
+    cache.delete_many([user_key(pk) for pk in pks])
+
+
+def forget_groups(*pks):
+    cache.delete_many([group_key(pk) for pk in pks if pk])
+
+
+def forget_posts(*pks):
+    cache.delete_many([post_key(pk) for pk in pks])
@@ -0,0 +1,48 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт миниатюры всех размеров для картинок постов '
+        'в пуле процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов, по умолчанию — по числу ядер.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать уже существующие миниатюры.'
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='')
+            .order_by().values_list('image', flat=True).distinct()
+        )
+        # Дочерние процессы в базу не ходят, соединения им не нужны.
+        connections.close_all()
+        force = [options['force']] * len(names)
+        with ProcessPoolExecutor(options['workers']) as pool:
+            results = list(pool.map(
+                thumbnails.generate_all, names, force, chunksize=16
+            ))
+        failed = results.count(False)
+        thumbnails.thumbnails_ready.send(
+            sender=None,
+            names=[name for name, ok in zip(names, results) if ok]
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(names) - failed}.'
+        ))
+        if failed:
+            self.stderr.write(f'С ошибками: {failed}.')
@@ -0,0 +1,112 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import thumbnails
+from posts.lookups import forget_posts
+from posts.models import Post, PostCard
+from posts.page_cache import invalidate_pages
+from posts.signals import post_pages
+from posts.storage import is_hashed, post_images
+
+# Миниатюры старого имени к новому не подходят — их поля сбрасываются.
+EMPTY_THUMBNAIL = {
+    'thumbnail_url': '',
+    'thumbnail_width': None,
+    'thumbnail_height': None,
+    'thumbnail_srcset': '',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в раскладку хранилища: имя по хешу '
+        'содержимого в подкаталогах posts/ab/cd/. Работает порциями, '
+        'старые файлы остаются доступны, пока на них ссылаются посты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько разных картинок переносить за раз.'
+        )
+        parser.add_argument(
+            '--delete-old', action='store_true',
+            help='Удалить файлы со старыми именами после переноса.'
+        )
+
+    def handle(self, *args, **options):
+        moved = set()
+        unique = set()
+        for names in self.batches(options['batch_size']):
+            renamed = self.copy_files(names)
+            posts = self.relink(renamed)
+            # Страницы и записи кеша со старыми именами сбрасываются
+            # для всех перенесённых постов, даже если миниатюры не
+            # создадутся: иначе после удаления старых файлов они
+            # ссылались бы на пустоту.
+            if posts:
+                forget_posts(*[post.pk for post in posts])
+                invalidate_pages(*post_pages(posts))
+            ready = [
+                name for name in sorted(set(renamed.values()))
+                if thumbnails.generate_all(name)
+            ]
+            thumbnails.thumbnails_ready.send(sender=None, names=ready)
+            if options['delete_old']:
+                for old in renamed:
+                    post_images.delete(old)
+            moved.update(renamed)
+            unique.update(renamed.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено картинок: {len(moved)}, '
+            f'уникальных файлов: {len(unique)}.'
+        ))
+
+    @staticmethod
+    def batches(size):
+        """
+        Старые имена картинок порциями по индексу image. Перенесённые
+        имена уже в раскладке хранилища и при обходе пропускаются.
+        """
+        last = ''
+        while True:
+            names = list(
+                Post.objects.filter(image__gt=last).order_by('image')
+                .values_list('image', flat=True).distinct()[:size]
+            )
+            if not names:
+                return
+            last = names[-1]
+            names = [name for name in names if not is_hashed(name)]
+            if names:
+                yield names
+
+    def copy_files(self, names):
+        """Копирует файлы под новые имена; старые пока не трогает."""
+        renamed = {}
+        for name in names:
+            if not post_images.exists(name):
+                self.stderr.write(f'Нет файла: {name}')
+                continue
+            with post_images.open(name) as content:
+                renamed[name] = post_images.save(name, content)
+        return renamed
+
+    @staticmethod
+    def relink(renamed):
+        """
+        Переключает посты и карточки порции на новые имена.
+        Возвращает переключённые посты.
+        """
+        with transaction.atomic():
+            posts = list(Post.objects.filter(image__in=renamed).only(
+                'pk', 'author_id', 'group_id'
+            ))
+            for old, new in renamed.items():
+                Post.objects.filter(image=old).update(
+                    image=new, **EMPTY_THUMBNAIL
+                )
+                PostCard.objects.filter(image=old).update(
+                    image=new, **EMPTY_THUMBNAIL
+                )
+        return posts
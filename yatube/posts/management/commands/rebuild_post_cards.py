@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import cards
+
+
+class Command(BaseCommand):
+    help = 'Пересоздаёт карточки постов для лент.'
+
+    def handle(self, *args, **options):
+        cards.rebuild()
+        self.stdout.write(self.style.SUCCESS('Карточки постов пересозданы.'))
@@ -0,0 +1,81 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+
+
+def fill_cards(apps, schema_editor):
+    """
+    Карточки существующих постов. Адреса миниатюр здесь не ищутся:
+    их ставит команда rebuild_post_cards или generate_thumbnails.
+    """
+    Post = apps.get_model('posts', 'Post')
+    PostCard = apps.get_model('posts', 'PostCard')
+    posts = Post.objects.select_related('author', 'group').order_by('pk')
+    cards = []
+    for post in posts.iterator():
+        author = post.author
+        full_name = f'{author.first_name} {author.last_name}'.strip()
+        cards.append(PostCard(
+            post_id=post.pk,
+            author_id=post.author_id,
+            group_id=post.group_id,
+            pub_date=post.pub_date,
+            text=post.text,
+            image=post.image.name,
+            author_username=author.username,
+            author_full_name=full_name,
+            group_slug=post.group.slug if post.group_id else '',
+            group_title=post.group.title if post.group_id else '',
+        ))
+    PostCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_post_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostCard',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('text', models.TextField(verbose_name='Текст поста')),
+                ('image', models.ImageField(blank=True, upload_to='posts/', verbose_name='Картинка')),
+                ('thumbnail_url', models.CharField(blank=True, max_length=255, verbose_name='Адрес миниатюры')),
+                ('author_username', models.CharField(max_length=150, verbose_name='Логин автора')),
+                ('author_full_name', models.CharField(blank=True, max_length=300, verbose_name='Имя автора')),
+                ('group_slug', models.CharField(blank=True, max_length=50, verbose_name='Адрес группы')),
+                ('group_title', models.CharField(blank=True, max_length=200, verbose_name='Название группы')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'ordering': ['-pub_date', '-post_id'],
+            },
+            bases=(posts.models.CardMixin, models.Model),
+        ),
+        migrations.AddIndex(
+            model_name='postcard',
+            index=models.Index(fields=['-pub_date', '-post'], name='card_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postcard',
+            index=models.Index(fields=['author', '-pub_date', '-post'], name='card_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postcard',
+            index=models.Index(fields=['group', '-pub_date', '-post'], name='card_group_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postcard',
+            index=models.Index(fields=['image'], name='card_image_idx'),
+        ),
+        migrations.RunPython(fill_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_card'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_url',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Адрес миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='postcard',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Высота миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='postcard',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина миниатюры'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['image'], name='post_image_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:04
+
+from django.db import migrations, models
+from posts.storage import legacy_images
+from posts.thumbnails import thumbnail_fields
+
+
+def fill_thumbnail_fields(apps, schema_editor):
+    """
+    Поля миниатюр существующих постов по уже созданным файлам.
+    Миниатюры из шаблонов названы sorl по прежнему хранилищу
+    исходников, поэтому ищутся и под этими именами.
+    Миниатюры здесь не создаются: недостающие ставятся в очередь,
+    когда пост с заглушкой впервые показывают.
+    """
+    Post = apps.get_model('posts', 'Post')
+    PostCard = apps.get_model('posts', 'PostCard')
+    names = list(Post.objects.exclude(image='').filter(
+        thumbnail_url=''
+    ).values_list('image', flat=True).distinct())
+    for name in names:
+        fields = thumbnail_fields(name, schedule_missing=False)
+        if not fields['thumbnail_url']:
+            fields = thumbnail_fields(
+                name, schedule_missing=False, storage=legacy_images
+            )
+        if not fields['thumbnail_url']:
+            continue
+        Post.objects.filter(image=name).update(**fields)
+        PostCard.objects.filter(image=name).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_thumbnail_fields'),
+        ('thumbnail', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_srcset',
+            field=models.TextField(blank=True, editable=False, verbose_name='Миниатюры разной ширины'),
+        ),
+        migrations.AddField(
+            model_name='postcard',
+            name='thumbnail_srcset',
+            field=models.TextField(blank=True, verbose_name='Миниатюры разной ширины'),
+        ),
+        migrations.RunPython(
+            fill_thumbnail_fields, migrations.RunPython.noop
+        ),
+    ]
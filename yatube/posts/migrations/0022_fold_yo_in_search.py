@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from posts.search import is_available, rebuild_index
+
+
+def reindex_folded(apps, schema_editor):
+    """Индекс с ё, свёрнутой в е, как в запросах поиска."""
+    if is_available():
+        rebuild_index()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_folded, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.16 on 2026-10-17 08:04
+
+from django.db import migrations, models
+import posts.images
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_fold_yo_in_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', validators=[posts.images.validate_image_size], verbose_name='Картинка'),
+        ),
+    ]
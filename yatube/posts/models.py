@@ -1,21 +1,86 @@
+import hashlib
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.dispatch import Signal
 from core.models import CreatedModel
 
+from .images import validate_image_size
+from .storage import post_images
+
 User = get_user_model()
 
+# bulk_create не отправляет post_save, поэтому сообщаем о пачке постов сами.
+posts_bulk_created = Signal()
+
+
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self):
+        """
+        Выборка для карточек постов в лентах: автор и группа одним
+        запросом, без полей, которые карточки не показывают.
+        """
+        return self.select_related('author', 'group').defer(
+            'author__password',
+            'author__email',
+            'author__last_login',
+            'author__is_superuser',
+            'author__is_staff',
+            'author__is_active',
+            'author__date_joined',
+            'group__description',
+        )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        posts = super().bulk_create(objs, *args, **kwargs)
+        posts_bulk_created.send(sender=self.model, posts=posts)
+        return posts
+
+
+class CardMixin:
+    """
+    Поля карточки поста в ленте. Их дают и пост, и его строка
+    в PostCard, поэтому шаблон карточки рендерит любой из них.
+    """
+
+    @property
+    def card_version(self):
+        """
+        Версия карточки поста для кеша фрагментов. Меняется при правке
+        поста, смене имени автора или группы и готовности миниатюры,
+        поэтому устаревшая карточка из кеша не показывается
+        и сбрасывать её не нужно.
+        """
+        parts = (
+            self.text,
+            self.image.name or '',
+            self.pub_date.isoformat(),
+            self.author_username,
+            self.author_full_name,
+            self.group_slug,
+            self.thumbnail_url,
+            self.thumbnail_srcset,
+        )
+        return hashlib.md5('\x1f'.join(parts).encode()).hexdigest()
+
 
 class Group(models.Model):
 
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=50, unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class Post(CardMixin, models.Model):
 
     text = models.TextField(
         verbose_name='Текст поста',
@@ -41,15 +106,67 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=post_images,
+        blank=True,
+        validators=[validate_image_size]
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    thumbnail_url = models.CharField(
+        'Адрес миниатюры', max_length=255, blank=True, editable=False
+    )
+    thumbnail_width = models.PositiveIntegerField(
+        'Ширина миниатюры', null=True, blank=True, editable=False
+    )
+    thumbnail_height = models.PositiveIntegerField(
+        'Высота миниатюры', null=True, blank=True, editable=False
+    )
+    thumbnail_srcset = models.TextField(
+        'Миниатюры разной ширины', blank=True, editable=False
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+            models.Index(fields=['image'], name='post_image_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def author_username(self):
+        return self.author.username
+
+    @property
+    def author_full_name(self):
+        return self.author.get_full_name()
+
+    @property
+    def group_slug(self):
+        return self.group.slug if self.group_id else ''
+
+    @property
+    def group_title(self):
+        return self.group.title if self.group_id else ''
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -72,6 +189,12 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -98,3 +221,153 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class UserCounters(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+
+class GroupSubscription(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='group_subscriptions',
+        verbose_name='Подписчик',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='subscribers',
+        verbose_name='Сообщество',
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'group'],
+                name='unique_group_subscription'
+            )
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост автора у подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'
+            )
+        ]
+
+
+class PostCard(CardMixin, models.Model):
+    """
+    Карточка поста для лент: всё, что показывает карточка, в одной строке.
+    Лента читается одним запросом по индексу без соединений;
+    строки обновляют сигналы поста, автора, группы и миниатюр.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True, null=True,
+        verbose_name='Группа',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+    text = models.TextField('Текст поста')
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        storage=post_images,
+        blank=True
+    )
+    thumbnail_url = models.CharField(
+        'Адрес миниатюры', max_length=255, blank=True
+    )
+    thumbnail_width = models.PositiveIntegerField(
+        'Ширина миниатюры', null=True, blank=True
+    )
+    thumbnail_height = models.PositiveIntegerField(
+        'Высота миниатюры', null=True, blank=True
+    )
+    thumbnail_srcset = models.TextField('Миниатюры разной ширины', blank=True)
+    author_username = models.CharField('Логин автора', max_length=150)
+    author_full_name = models.CharField(
+        'Имя автора', max_length=300, blank=True
+    )
+    group_slug = models.CharField('Адрес группы', max_length=50, blank=True)
+    group_title = models.CharField(
+        'Название группы', max_length=200, blank=True
+    )
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-post'],
+                name='card_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-post'],
+                name='card_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-post'],
+                name='card_group_date_idx'
+            ),
+            models.Index(fields=['image'], name='card_image_idx'),
+        ]
+
+    def __str__(self):
+        return self.text[:15]
@@ -0,0 +1,218 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from core.cache import single_flight
+
+from .holes import fill_holes
+from .post_settings import PAGE_CACHE_TIMEOUT
+
+# Пространство имён, от которого зависят все страницы.
+SITE = 'site'
+
+
+def version_key(namespace):
+    return f'posts:page_version:{namespace}'
+
+
+def modified_key(namespace):
+    return f'posts:page_modified:{namespace}'
+
+
+def page_versions(namespaces):
+    """
+    Текущие версии пространств имён страниц.
+    Пропавшая из кеша версия начинается с метки времени, а не с нуля,
+    чтобы не совпасть ни с одной из прежних версий.
+    """
+    keys = {version_key(namespace): namespace for namespace in namespaces}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        cache.add(key, time.time_ns(), None)
+        versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def pages_modified(namespaces):
+    """
+    Время последнего изменения страниц пространств имён.
+    Если отметки нет, страница считается изменённой только что.
+    """
+    keys = [modified_key(namespace) for namespace in namespaces]
+    modified = cache.get_many(keys)
+    now = time.time()
+    for key in set(keys) - modified.keys():
+        cache.add(key, now, None)
+        modified[key] = cache.get(key, now)
+    return max(modified.values())
+
+
+def invalidate_pages(*namespaces):
+    """Сбрасывает закешированные страницы пространств имён."""
+    now = time.time()
+    cache.set_many(
+        {modified_key(namespace): now for namespace in namespaces}, None
+    )
+    for namespace in set(namespaces):
+        key = version_key(namespace)
+        if not cache.add(key, time.time_ns(), None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), None)
+
+
+def namespace_names(namespaces, kwargs):
+    """
+    Имена пространств имён страницы по аргументам представления.
+    Пространство — шаблон вроде 'group:{slug}' или функция от kwargs,
+    если имя нужно найти, например профиль автора поста.
+    """
+    return [
+        namespace(**kwargs) if callable(namespace)
+        else namespace.format(**kwargs)
+        for namespace in namespaces
+    ]
+
+
+def is_anonymous(request):
+    """Запрос без сессии: проверка не ходит в базу."""
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def page_key(request, namespaces, kind='page'):
+    versions = page_versions([SITE, *namespaces])
+    url = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return 'posts:{}:{}:{}'.format(
+        kind, url, '.'.join(str(version) for version in versions)
+    )
+
+
+def is_cacheable(response):
+    return response.status_code == 200 and not response.cookies
+
+
+def anonymous_response(request, view, key, *args, **kwargs):
+    """Ответ анонимному посетителю: закешированный целиком."""
+    response = single_flight(
+        key, lambda: view(request, *args, **kwargs),
+        PAGE_CACHE_TIMEOUT, keep=is_cacheable
+    )
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def user_response(request, view, key, *args, **kwargs):
+    """
+    Ответ пользователю: общее для всех пользователей тело страницы
+    берётся из кеша, а фрагменты с меткой user_fragment
+    рендерятся для текущего пользователя.
+    """
+    def render_body():
+        request.punch_holes = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            request.punch_holes = False
+
+    response = single_flight(
+        key, render_body, PAGE_CACHE_TIMEOUT, keep=is_cacheable
+    )
+    response.content = fill_holes(
+        request, response.content.decode(response.charset)
+    )
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def cached_page(*namespaces):
+    """
+    Кеширует страницу, которую представление отдаёт всем одинаково.
+    Анонимам отдаётся весь ответ из кеша, пользователям — тело страницы
+    из кеша с подставленными фрагментами пользователя.
+    namespaces — шаблоны пространств имён, например 'group:{slug}',
+    их подставляют из аргументов представления (см. namespace_names).
+    Сигналы моделей меняют версию пространства, и старые страницы
+    больше не читаются.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            names = namespace_names(namespaces, kwargs)
+            if is_anonymous(request):
+                key = page_key(request, names)
+                return anonymous_response(request, view, key, *args, **kwargs)
+            if not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            key = page_key(request, names, kind='body')
+            return user_response(request, view, key, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def user_namespace(user_id):
+    """Пространство имён фрагментов страниц, зависящих от подписок."""
+    return f'user:{user_id}'
+
+
+def page_state(request, namespaces, extra=None):
+    """
+    Версии и время изменения страницы для условного GET.
+    Считаются один раз на запрос: их спрашивают и ETag, и Last-Modified.
+    """
+    state = getattr(request, '_page_state', None)
+    if state is not None:
+        return state
+    names = [SITE, *namespaces]
+    user_id = session = None
+    logged_in = None
+    if not is_anonymous(request) and request.user.is_authenticated:
+        user_id = request.user.pk
+        # В странице форма с CSRF-токеном сессии: после нового входа
+        # старая копия не годится, хотя версии страниц те же.
+        session = request.session.session_key
+        logged_in = request.user.last_login
+        names.append(user_namespace(user_id))
+        if extra is not None:
+            names.extend(extra(request))
+    versions = '.'.join(str(version) for version in page_versions(names))
+    etag = hashlib.md5(
+        f'{user_id}:{session}:{versions}'.encode()
+    ).hexdigest()
+    modified = datetime.fromtimestamp(pages_modified(names), timezone.utc)
+    if logged_in is not None:
+        modified = max(modified, logged_in)
+    request._page_state = etag, modified
+    return request._page_state
+
+
+def conditional_page(*namespaces, extra=None):
+    """
+    Ставит странице ETag и Last-Modified по версиям её пространств имён
+    и отвечает 304 без рендера, если страница не менялась.
+    ETag учитывает пользователя и его сессию: в странице есть
+    его фрагменты и CSRF-токен.
+    extra(request) — дополнительные пространства имён пользователя.
+    """
+    def decorator(view):
+        def names(kwargs):
+            return namespace_names(namespaces, kwargs)
+
+        def etag(request, *args, **kwargs):
+            return page_state(request, names(kwargs), extra)[0]
+
+        def last_modified(request, *args, **kwargs):
+            return page_state(request, names(kwargs), extra)[1]
+
+        return condition(etag_func=etag, last_modified_func=last_modified)(
+            view
+        )
+    return decorator
@@ -0,0 +1,292 @@
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from core.cache import single_flight
+
+from .post_settings import COUNT_CACHE_TIMEOUT, PAGE_WINDOW
+
+KEYSET_FIELDS = ('pub_date', 'id')
+# Сколько источников MergedPaginator сливает одним запросом: SQLite
+# ограничивает число частей UNION и параметров в запросе.
+MERGE_CHUNK_SIZE = 200
+
+
+def count_cache_key(feed):
+    """Ключ кеша с количеством постов ленты, например 'group:3'."""
+    return f'posts:count:{feed}'
+
+
+def cached_count(object_list, feed):
+    """Количество постов ленты feed, закешированное до её изменения."""
+    return single_flight(
+        count_cache_key(feed), object_list.count, COUNT_CACHE_TIMEOUT
+    )
+
+
+def invalidate_counts(*feeds):
+    """Сбрасывает закешированные количества постов для лент."""
+    cache.delete_many([count_cache_key(feed) for feed in feeds])
+
+
+class BoundedPaginator(Paginator):
+    """
+    Паджинатор с окном номеров страниц вокруг текущей
+    и закешированным общим количеством постов.
+    count_queryset — более дешёвая выборка с тем же числом строк,
+    по которой считается количество.
+    """
+
+    def __init__(self, object_list, per_page, count_key=None,
+                 window=PAGE_WINDOW, count_queryset=None):
+        super().__init__(object_list, per_page)
+        self.count_key = count_key
+        self.window = window
+        self.count_queryset = count_queryset
+        self.page_window = []
+
+    @cached_property
+    def count(self):
+        counted = self.count_queryset
+        if counted is None:
+            if self.count_key is None:
+                return super().count
+            counted = self.object_list
+        if self.count_key is None:
+            return counted.count()
+        return cached_count(counted, self.count_key)
+
+    def page(self, number):
+        page = super().page(number)
+        self.page_window = self.get_page_window(page.number)
+        return page
+
+    def get_page_window(self, number):
+        """
+        Номера страниц для навигации: первая, последняя и number±window.
+        Пропуски между ними обозначены None.
+        """
+        last = self.num_pages
+        numbers = {1, last}
+        numbers.update(range(
+            max(number - self.window, 1),
+            min(number + self.window, last) + 1
+        ))
+        window = []
+        previous = 0
+        for i in sorted(numbers):
+            if i - previous > 1:
+                window.append(None)
+            window.append(i)
+            previous = i
+        return window
+
+
+def encode_cursor(post):
+    """Упаковывает ключ (pub_date, id) поста в непрозрачный токен."""
+    raw = f'{post.pub_date.isoformat()}|{post.pk}'
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(token):
+    """
+    Распаковывает токен курсора в пару (pub_date, id).
+    Для битого токена возвращает None.
+    """
+    try:
+        raw = urlsafe_base64_decode(token).decode()
+        pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class KeysetPage(Page):
+    """Страница курсорной паджинации: без номера и общего количества."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_token(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_token(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor(self.object_list[0])
+
+
+class KeysetPaginator(Paginator):
+    """
+    Курсорный паджинатор по ключу (pub_date, id).
+    Каждая страница — один запрос с LIMIT по индексу, без COUNT(*) и OFFSET,
+    поэтому её стоимость не зависит от глубины листания.
+    fields — поля, по которым сортируется и фильтруется выборка; значения
+    курсора всегда берутся из pub_date и pk поста.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page, fields=KEYSET_FIELDS):
+        self.date_field, self.id_field = fields
+        super().__init__(
+            object_list.order_by(
+                F(self.date_field).desc(), F(self.id_field).desc()
+            ),
+            per_page
+        )
+
+    def get_page_by_cursor(self, after=None, before=None):
+        """
+        Возвращает страницу постов старше курсора after
+        или новее курсора before. Без курсора — первую страницу.
+        """
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        if after or not before:
+            return self.page_older_than(after)
+        return self.page_newer_than(before)
+
+    def older_than(self, queryset, cursor=None):
+        """Посты queryset старше ключа cursor, от новых к старым."""
+        if cursor is None:
+            return queryset
+        pub_date, pk = cursor
+        # Граница по одной дате даёт индексу диапазон, а не проход
+        # по всем строкам от начала ленты.
+        return queryset.filter(
+            Q(**{f'{self.date_field}__lte': pub_date}),
+            Q(**{f'{self.date_field}__lt': pub_date})
+            | Q(**{self.date_field: pub_date, f'{self.id_field}__lt': pk})
+        )
+
+    def newer_than(self, queryset, cursor):
+        """Посты queryset новее ключа cursor, от старых к новым."""
+        pub_date, pk = cursor
+        return queryset.filter(
+            Q(**{f'{self.date_field}__gte': pub_date}),
+            Q(**{f'{self.date_field}__gt': pub_date})
+            | Q(**{self.date_field: pub_date, f'{self.id_field}__gt': pk})
+        ).order_by(F(self.date_field).asc(), F(self.id_field).asc())
+
+    def page_older_than(self, cursor=None):
+        """Страница постов старше ключа cursor = (pub_date, id)."""
+        queryset = self.older_than(self.object_list, cursor)
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return KeysetPage(
+            rows[:self.per_page], self, has_next, cursor is not None
+        )
+
+    def page_newer_than(self, cursor):
+        """Страница постов новее ключа cursor = (pub_date, id)."""
+        queryset = self.newer_than(self.object_list, cursor)
+        rows = list(queryset[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return KeysetPage(rows, self, True, has_previous)
+
+
+class MergedPaginator(KeysetPaginator):
+    """
+    Курсорная паджинация по слиянию нескольких источников постов.
+    sources — условия Q поверх общей выборки object_list. Каждый
+    источник даёт не больше страницы постов от курсора по своему
+    индексу, а слияние и сортировка идут в SQL одним UNION:
+    страница стоит один запрос ключей на MERGE_CHUNK_SIZE источников
+    и один запрос самих постов, сколько бы ни было подписок.
+    """
+
+    def __init__(self, object_list, sources, per_page,
+                 fields=KEYSET_FIELDS):
+        super().__init__(object_list, per_page, fields)
+        self.sources = list(sources)
+
+    def page_older_than(self, cursor=None):
+        rows = self._merged(cursor)
+        has_next = len(rows) > self.per_page
+        return KeysetPage(
+            rows[:self.per_page], self, has_next, cursor is not None
+        )
+
+    def page_newer_than(self, cursor):
+        rows = self._merged(cursor, newer=True)
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return KeysetPage(rows, self, True, has_previous)
+
+    def _select(self, queryset, cursor, newer):
+        if newer:
+            return self.newer_than(queryset, cursor)
+        return self.older_than(queryset, cursor)
+
+    def _merged(self, cursor, newer=False):
+        """
+        Первые per_page + 1 постов слияния источников от курсора.
+        Пост из нескольких источников попадает в результат один раз.
+        """
+        limit = self.per_page + 1
+        ids = []
+        for start in range(0, len(self.sources), MERGE_CHUNK_SIZE):
+            ids.extend(self._merged_ids(
+                self.sources[start:start + MERGE_CHUNK_SIZE],
+                cursor, newer, limit
+            ))
+        if not ids:
+            return []
+        queryset = self.object_list.filter(pk__in=ids)
+        return list(self._select(queryset, cursor, newer)[:limit])
+
+    def _merged_ids(self, sources, cursor, newer, limit):
+        """id первых limit постов слияния sources одним запросом."""
+        connection = connections[self.object_list.db]
+        parts = []
+        params = []
+        for source in sources:
+            part = self.source_keys(source, cursor, newer)[:limit]
+            sql, part_params = part.query.get_compiler(
+                connection=connection
+            ).as_sql()
+            parts.append(f'SELECT * FROM ({sql})')
+            params.extend(part_params)
+        union = ' UNION '.join(parts)
+        direction = 'ASC' if newer else 'DESC'
+        # Колонки частей могут называться по-разному: сортируем
+        # по номерам — 1 это id, 2 это дата.
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(
+                f'SELECT * FROM ({union}) '
+                f'ORDER BY 2 {direction}, 1 {direction} LIMIT %s',
+                params + [limit]
+            )
+            return [row[0] for row in db_cursor.fetchall()]
+
+    def source_keys(self, source, cursor, newer):
+        """Пары (id, дата) постов источника от курсора, по его индексу."""
+        return self._select(
+            self.object_list.filter(source), cursor, newer
+        ).values_list(self.id_field, self.date_field)
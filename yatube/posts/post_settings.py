@@ -1,3 +1,26 @@
 from django.conf import settings
 
 PAGINATOR_SET = getattr(settings, 'POSTS_PAGINATOR_SET', 10)
+# 'numbered' — страницы по номерам, 'keyset' — курсорные ?after=/?before=.
+PAGINATION_MODE = getattr(settings, 'POSTS_PAGINATION_MODE', 'numbered')
+# Сколько номеров страниц показывать по обе стороны от текущей.
+PAGE_WINDOW = getattr(settings, 'POSTS_PAGE_WINDOW', 2)
+COUNT_CACHE_TIMEOUT = getattr(settings, 'POSTS_COUNT_CACHE_TIMEOUT', 60 * 15)
+# Авторам с большим числом подписчиков посты по лентам не разносятся.
+FANOUT_LIMIT = getattr(settings, 'POSTS_FANOUT_LIMIT', 1000)
+# Сколько хранить страницы, закешированные для анонимных посетителей.
+PAGE_CACHE_TIMEOUT = getattr(settings, 'POSTS_PAGE_CACHE_TIMEOUT', 60 * 10)
+# Сколько хранить в кеше пользователей, группы и посты, найденные по ключу.
+LOOKUP_CACHE_TIMEOUT = getattr(
+    settings, 'POSTS_LOOKUP_CACHE_TIMEOUT', 60 * 60
+)
+# Сколько помнить, что пользователя, группы или поста с таким ключом нет.
+MISSING_LOOKUP_TIMEOUT = getattr(
+    settings, 'POSTS_MISSING_LOOKUP_TIMEOUT', 60 * 5
+)
+# Ограничения на картинки постов: размер загрузки, число пикселей
+# до декодирования и наибольшая сторона сохранённого оригинала.
+IMAGE_MAX_BYTES = getattr(settings, 'POSTS_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+IMAGE_MAX_PIXELS = getattr(settings, 'POSTS_IMAGE_MAX_PIXELS', 25_000_000)
+IMAGE_MAX_SIDE = getattr(settings, 'POSTS_IMAGE_MAX_SIDE', 2048)
+IMAGE_QUALITY = getattr(settings, 'POSTS_IMAGE_QUALITY', 85)
@@ -0,0 +1,158 @@
+import re
+
+from django.db import connection
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+
+def folded(column):
+    """
+    Текст в том виде, в каком он попадает в индекс: ё заменена на е.
+    unicode61 сам приводит регистр, но ё в е не сворачивает, а запрос
+    match_expression сворачивает, поэтому индекс и запрос приводятся
+    к одному виду.
+    """
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+TRIGGERS = {
+    'ai': f'''
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text)
+        VALUES (new.id, {folded('new.text')});
+    END
+    ''',
+    'ad': f'''
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON posts_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, {folded('old.text')});
+    END
+    ''',
+    'au': f'''
+    CREATE TRIGGER {FTS_TABLE}_au
+    AFTER UPDATE OF text ON posts_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, {folded('old.text')});
+        INSERT INTO {FTS_TABLE}(rowid, text)
+        VALUES (new.id, {folded('new.text')});
+    END
+    ''',
+}
+WORD = re.compile(r'\w+')
+# Частые окончания русских слов: поиск идёт по основе как по префиксу,
+# поэтому «котами» находит и «кот», и «коты».
+ENDINGS = sorted((
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ов', 'ев',
+    'ей', 'ой', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ом',
+    'ем', 'ах', 'ях', 'ам', 'ям', 'ую', 'юю', 'а', 'я', 'о', 'е', 'ы',
+    'и', 'у', 'ю', 'ь',
+), key=len, reverse=True)
+MIN_STEM = 3
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def install_triggers(**kwargs):
+    """
+    Создаёт триггеры, синхронизирующие индекс с posts_post.
+    Вызывается после каждого migrate: SQLite пересоздаёт таблицу
+    при изменении её схемы, и триггеры при этом пропадают, а старые
+    версии триггеров заменяются текущими.
+    """
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        if FTS_TABLE not in connection.introspection.table_names(cursor):
+            return
+        for suffix, sql in TRIGGERS.items():
+            cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+            cursor.execute(sql)
+
+
+def rebuild_index():
+    """
+    Перестраивает полнотекстовый индекс по текущим постам.
+    Встроенный 'rebuild' индексировал бы текст без свёртки ё,
+    поэтому индекс заполняется заново тем же выражением, что в триггерах.
+    """
+    install_triggers()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, text) "
+            f"SELECT id, {folded('text')} FROM posts_post"
+        )
+
+
+def stem(word):
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def match_expression(query):
+    """
+    Запрос пользователя в синтаксисе FTS5: каждое слово ищется
+    по основе как префикс, все слова должны встретиться в посте.
+    """
+    words = WORD.findall(query.lower().replace('ё', 'е'))
+    return ' '.join(f'"{stem(word)}"*' for word in words)
+
+
+class PostSearch:
+    """
+    Результаты поиска, упорядоченные по релевантности (bm25).
+    Поддерживает count() и срезы, поэтому подходит для Paginator.
+    """
+
+    def __init__(self, query):
+        self.expression = match_expression(query)
+
+    def count(self):
+        if not self.expression:
+            return 0
+        if not is_available():
+            return self._fallback().count()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [self.expression]
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.expression:
+            return []
+        if not is_available():
+            return list(self._fallback()[index])
+        start = index.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.expression, index.stop - start, start]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def _fallback(self):
+        posts = Post.objects.for_feed()
+        for word in WORD.findall(self.expression):
+            posts = posts.filter(text__icontains=word)
+        return posts
@@ -0,0 +1,256 @@
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from collections import Counter
+
+from .models import (Comment, Follow, Group, GroupSubscription, Post,
+                     PostCard, User, UserCounters, posts_bulk_created)
+from . import cards, counters, thumbnails, timeline
+from .lookups import (USER_FIELDS, forget_groups, forget_max_post_id,
+                      forget_posts, forget_slugs, forget_usernames,
+                      forget_users)
+from .page_cache import SITE, invalidate_pages, user_namespace
+from .paginators import invalidate_counts
+from .post_settings import FANOUT_LIMIT
+
+
+def post_feeds(post, group_ids=()):
+    """Имена лент, в которые попадает пост."""
+    feeds = ['index', f'author:{post.author_id}']
+    feeds.extend(
+        f'group:{group_id}'
+        for group_id in {post.group_id, *group_ids} if group_id
+    )
+    # Ленты подписок здесь не перечисляются: ключ их количества
+    # включает версии профилей авторов (см. views.follow_count_key).
+    return feeds
+
+
+def post_pages(posts, group_ids=()):
+    """Пространства имён закешированных страниц, на которых видны посты."""
+    pages = ['index']
+    pages.extend(f'post:{post.pk}' for post in posts if post.pk)
+    usernames = User.objects.filter(
+        pk__in={post.author_id for post in posts}
+    ).values_list('username', flat=True)
+    pages.extend(f'profile:{username}' for username in usernames)
+    slugs = Group.objects.filter(
+        pk__in={post.group_id for post in posts} | set(group_ids)
+    ).values_list('slug', flat=True)
+    pages.extend(f'group:{slug}' for slug in slugs)
+    return pages
+
+
+def user_pages(*user_ids):
+    usernames = User.objects.filter(
+        pk__in=user_ids
+    ).values_list('username', flat=True)
+    return [f'profile:{username}' for username in usernames]
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, **kwargs):
+    """Запоминает прежние группу и картинку редактируемого поста."""
+    instance._old_group_id = None
+    instance._old_image = None
+    if instance.pk:
+        instance._old_group_id, instance._old_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first() or (None, None)
+
+
+def store_thumbnail_fields(post):
+    """
+    Ставит посту адрес и размеры миниатюры новой картинки.
+    Файл картинки сохраняется внутри save(), поэтому это делается
+    после сохранения отдельным обновлением и только при её смене.
+    """
+    if post.image.name == getattr(post, '_old_image', None):
+        return
+    fields = thumbnails.thumbnail_fields(post.image)
+    if all(getattr(post, name) == value for name, value in fields.items()):
+        return
+    Post.objects.filter(pk=post.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(post, name, value)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    old_group_id = getattr(instance, '_old_group_id', None)
+    store_thumbnail_fields(instance)
+    if created:
+        counters.change_user_counters(instance.author_id, posts_count=1)
+        counters.change_group_posts(instance.group_id, 1)
+        forget_max_post_id()
+        timeline.fan_out(instance)
+    elif old_group_id != instance.group_id:
+        counters.change_group_posts(old_group_id, -1)
+        counters.change_group_posts(instance.group_id, 1)
+    if created or old_group_id != instance.group_id:
+        invalidate_counts(*post_feeds(instance, [old_group_id]))
+    cards.save_card(instance)
+    forget_posts(instance.pk)
+    invalidate_pages(*post_pages([instance], [old_group_id]))
+
+
+@receiver(posts_bulk_created, sender=Post)
+def posts_bulk_saved(sender, posts, **kwargs):
+    feeds = set()
+    unique = {(post.author_id, post.group_id): post for post in posts}
+    for post in unique.values():
+        feeds.update(post_feeds(post))
+    invalidate_counts(*feeds)
+    forget_max_post_id()
+    invalidate_pages(*post_pages(unique.values()))
+    by_author = Counter(post.author_id for post in posts)
+    for author_id, added in by_author.items():
+        counters.change_user_counters(author_id, posts_count=added)
+    by_group = Counter(post.group_id for post in posts)
+    for group_id, added in by_group.items():
+        counters.change_group_posts(group_id, added)
+    # На SQLite посты из bulk_create приходят без pk: новые посты — это
+    # те, что только что получили карточки. По их pk снимается метка
+    # «нет такого поста» и разносятся по лентам только они.
+    created = cards.create_missing_cards(by_author.keys())
+    forget_posts(*created)
+    timeline.fan_out_bulk(created)
+    for post in posts:
+        thumbnails.schedule(post.image)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_counters(instance.author_id, posts_count=-1)
+    counters.change_group_posts(instance.group_id, -1)
+    invalidate_counts(*post_feeds(instance))
+    forget_posts(instance.pk)
+    invalidate_pages(*post_pages([instance]))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post_comments(instance.post_id, 1)
+    invalidate_pages(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_post_comments(instance.post_id, -1)
+    invalidate_pages(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    counters.change_user_counters(instance.author_id, followers_count=1)
+    counters.change_user_counters(instance.user_id, following_count=1)
+    invalidate_pages(
+        *user_pages(instance.user_id, instance.author_id),
+        user_namespace(instance.user_id)
+    )
+    if not timeline.is_celebrity(instance.author_id):
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_counters(instance.author_id, followers_count=-1)
+    counters.change_user_counters(instance.user_id, following_count=-1)
+    invalidate_pages(
+        *user_pages(instance.user_id, instance.author_id),
+        user_namespace(instance.user_id)
+    )
+    timeline.trim(instance.user_id, instance.author_id)
+    if timeline.followers_count(instance.author_id) == FANOUT_LIMIT:
+        # Автор перестал быть популярным: его посты снова разносятся,
+        # и ленты подписчиков догоняются уже после ответа.
+        timeline.schedule_backfill(instance.author_id)
+
+
+@receiver(post_save, sender=GroupSubscription)
+@receiver(post_delete, sender=GroupSubscription)
+def group_subscription_changed(sender, instance, **kwargs):
+    # Кнопка подписки — фрагмент пользователя, общие страницы не меняются.
+    invalidate_pages(user_namespace(instance.user_id))
+
+
+@receiver(post_save, sender=Group)
+def group_created(sender, instance, created, **kwargs):
+    # id удалённой группы может достаться новой — сбрасываем старый счётчик.
+    if created:
+        invalidate_counts(f'group:{instance.pk}')
+    else:
+        cards.update_group(instance)
+    forget_groups(instance.pk)
+    forget_slugs(instance.slug)
+    # Название и адрес группы видны на карточках во всех лентах.
+    invalidate_pages(SITE)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    cards.clear_group(instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    forget_groups(instance.pk)
+    invalidate_pages(SITE)
+
+
+@receiver(pre_save, sender=User)
+def remember_old_names(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает прежние имена пользователя. Сохранение, которое имён
+    не касается (вход обновляет только last_login), их не читает.
+    """
+    instance._old_names = None
+    if update_fields is not None and not set(update_fields) & set(
+        USER_FIELDS
+    ):
+        return
+    if instance.pk:
+        instance._old_names = User.objects.filter(
+            pk=instance.pk
+        ).values_list(*USER_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+        invalidate_counts(f'author:{instance.pk}')
+    forget_users(instance.pk)
+    forget_usernames(instance.username)
+    old_names = getattr(instance, '_old_names', None)
+    names = tuple(getattr(instance, field) for field in USER_FIELDS)
+    # Новый пользователь ещё нигде не виден, смена пароля или входа
+    # страниц не меняет. Имя же есть на карточках во всех лентах
+    # и у комментариев под любыми постами.
+    if old_names is None or old_names == names:
+        return
+    forget_usernames(old_names[0])
+    cards.update_author(instance)
+    invalidate_pages(SITE)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    forget_users(instance.pk)
+    invalidate_pages(SITE)
+
+
+@receiver(thumbnails.thumbnails_ready)
+def thumbnails_generated(sender, names, **kwargs):
+    for name in set(names):
+        fields = thumbnails.thumbnail_fields(name)
+        Post.objects.filter(image=name).update(**fields)
+        PostCard.objects.filter(image=name).update(**fields)
+    posts = list(Post.objects.filter(image__in=names))
+    if posts:
+        forget_posts(*[post.pk for post in posts])
+        invalidate_pages(*post_pages(posts))
@@ -0,0 +1,65 @@
+import hashlib
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024
+HASHED_NAME = re.compile(
+    r'^(?:.*/)?([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.\w+$'
+)
+
+
+def content_hash(content):
+    """sha256 содержимого файла, прочитанного порциями."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_hashed(name):
+    """Имя уже в раскладке хранилища: posts/ab/cd/abcd….jpg."""
+    return bool(HASHED_NAME.match(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, где имя файла — хеш его содержимого. Одинаковые картинки
+    хранятся один раз, посты ссылаются на общий файл, а sorl
+    по одному имени исходника создаёт миниатюры тоже один раз.
+    Файлы раскладываются по подкаталогам из первых символов хеша,
+    чтобы в одном каталоге не копились миллионы файлов.
+    """
+
+    def hashed_name(self, name, content):
+        directory, basename = posixpath.split(name)
+        extension = posixpath.splitext(basename)[1].lower()
+        digest = content_hash(content)
+        return posixpath.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        # Одновременная загрузка того же файла получит имя с суффиксом:
+        # копия лишняя, но ссылка на неё корректна.
+        return super().save(name, content, max_length=max_length)
+
+
+# Хранилище картинок постов: его же использует sorl для исходников.
+post_images = ContentAddressedStorage()
+# Хранилище, из которого sorl читал исходники до ContentAddressedStorage:
+# по нему названы миниатюры, созданные тегом thumbnail в шаблонах.
+legacy_images = FileSystemStorage()
@@ -0,0 +1,21 @@
+from django import template
+
+from posts import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def user_fragment(context, name, **params):
+    """
+    Фрагмент страницы, зависящий от пользователя. Пока тело страницы
+    рендерится для кеша, вместо фрагмента ставится метка, а сам
+    фрагмент подставляется при каждом ответе.
+    """
+    params = {key: str(value) for key, value in params.items()}
+    request = context.get('request')
+    if getattr(request, 'punch_holes', False):
+        return holes.placeholder(name, params)
+    fragment = context.template.engine.get_template(holes.FRAGMENTS[name][0])
+    with context.push(holes.fragment_context(request, name, params)):
+        return fragment.render(context)
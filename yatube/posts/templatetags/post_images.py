@@ -0,0 +1,15 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def schedule_thumbnails(image):
+    """
+    Ставит в очередь миниатюры картинки, которую показывают заглушкой:
+    у постов, созданных до появления полей миниатюр, их могло не быть.
+    """
+    thumbnails.schedule(image)
+    return ''
@@ -0,0 +1,43 @@
+from contextlib import ContextDecorator
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class query_budget(ContextDecorator):
+    """
+    Проверяет, что код внутри блока или декорированная функция
+    делает не больше budget запросов к базе.
+
+        with query_budget(5, label='/'):
+            client.get('/')
+    """
+
+    def __init__(self, budget, label=''):
+        self.budget = budget
+        self.label = label
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connection)
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.budget:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(self.context, start=1)
+            )
+            raise QueryBudgetExceeded(
+                f'{self.label}: {executed} запросов при бюджете '
+                f'{self.budget}:\n{queries}'
+            )
+        return False
@@ -0,0 +1,400 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
+from django.http import Http404
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.cache import single_flight, store
+
+from .. import lookups
+from ..models import Comment, Follow, Group, Post
+from ..page_cache import SITE, invalidate_pages
+
+User = get_user_model()
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.group2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test2',
+            description='Тестовое описание 2',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Тестовый пост'
+        )
+
+    def get(self, url):
+        # Страницы целиком сбрасываем, чтобы проверять кеш карточек.
+        invalidate_pages(SITE)
+        return self.guest_client.get(url)
+
+    def card_key(self, post):
+        post = Post.objects.for_feed().get(pk=post.pk)
+        return make_template_fragment_key(
+            'post_card', [post.pk, post.card_version]
+        )
+
+    def test_card_is_shared_between_pages(self):
+        """Одна закешированная карточка служит всем лентам."""
+        self.get(reverse('posts:index'))
+        key = self.card_key(self.post)
+        self.assertIsNotNone(cache.get(key))
+        store(key, 'карточка из кеша', None)
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'test'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.get(url), 'карточка из кеша')
+
+    def test_edits_change_card_version(self):
+        """Правка поста, имени автора или группы не показывает старое."""
+        url = reverse('posts:index')
+        self.get(url)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertContains(self.get(url), 'Исправленный пост')
+        self.user.first_name = 'Алексей'
+        self.user.save()
+        self.assertContains(self.get(url), 'Алексей Толстой')
+        self.post.group = self.group2
+        self.post.save()
+        self.assertContains(
+            self.get(url),
+            reverse('posts:group_posts', kwargs={'slug': 'test2'})
+        )
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Тестовый пост'
+        )
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'test'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+
+    def test_hit_skips_database_and_templates(self):
+        """Повторный анонимный запрос не ходит в базу и не рендерит."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(second.templates, [])
+                self.assertEqual(first.content, second.content)
+
+    def test_writes_invalidate_pages(self):
+        """Изменения постов, комментариев, групп и подписок видны сразу."""
+        for url in self.urls:
+            self.guest_client.get(url)
+        Post.objects.create(
+            author=self.user, group=self.group, text='Новый пост'
+        )
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Новый пост')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Новый коммент'
+        )
+        self.assertContains(
+            self.guest_client.get(self.urls[3]), 'Новый коммент'
+        )
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertContains(
+            self.guest_client.get(self.urls[2]), 'Подписчиков: 1'
+        )
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertContains(
+            self.guest_client.get(self.urls[1]), 'Новое название'
+        )
+
+    def test_unrelated_writes_keep_pages(self):
+        """Регистрация, пароль и чужие посты не сбрасывают страницу поста."""
+        url = self.urls[3]
+        self.guest_client.get(url)
+        User.objects.create_user(username='newcomer')
+        self.reader.set_password('новый пароль')
+        self.reader.save()
+        Post.objects.create(author=self.reader, text='Чужой пост')
+        with self.assertNumQueries(0):
+            self.guest_client.get(url)
+        Post.objects.create(author=self.user, text='Ещё пост автора')
+        self.assertContains(
+            self.guest_client.get(url), 'Всего постов автора:<span >2'
+        )
+        self.user.first_name = 'Лев'
+        self.user.save()
+        self.assertContains(self.guest_client.get(url), 'Лев')
+
+    def test_logged_in_user_is_not_served_from_cache(self):
+        """Пользователь с сессией получает свою страницу, а не кеш."""
+        self.guest_client.get(self.urls[0])
+        self.guest_client.force_login(self.reader)
+        response = self.guest_client.get(self.urls[0])
+        self.assertNotEqual(response.templates, [])
+
+
+class UserPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(author=cls.author, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.clients = {}
+        for user in (self.author, self.reader, self.other):
+            self.clients[user.username] = Client()
+            self.clients[user.username].force_login(user)
+
+    def test_body_is_shared_and_fragments_are_personal(self):
+        """Тело страницы общее, а шапка и кнопки — у каждого свои."""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        with CaptureQueriesContext(connection) as miss:
+            reader_page = self.clients['reader'].get(url)
+        with CaptureQueriesContext(connection) as hit:
+            other_page = self.clients['other'].get(url)
+        self.assertLess(len(hit), len(miss))
+        self.assertEqual(other_page.templates[0].name, 'includes/header.html')
+        self.assertContains(reader_page, 'Пользователь: reader')
+        self.assertContains(reader_page, 'Отписаться')
+        self.assertContains(other_page, 'Пользователь: other')
+        self.assertContains(other_page, 'Подписаться')
+        self.assertNotContains(other_page, '<!--fragment:')
+        author_page = self.clients['author'].get(url)
+        self.assertNotContains(author_page, 'Подписаться')
+
+    def test_post_detail_fragments(self):
+        """Форма комментария и кнопка правки подставляются каждому свои."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        author_page = self.clients['author'].get(url)
+        reader_page = self.clients['reader'].get(url)
+        self.assertContains(author_page, edit_url)
+        self.assertNotContains(reader_page, edit_url)
+        self.assertContains(reader_page, 'csrfmiddlewaretoken')
+        self.assertIn(settings.CSRF_COOKIE_NAME, reader_page.cookies)
+
+    def test_follow_updates_fragment(self):
+        """Подписка сразу меняет кнопку в закешированной странице."""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        client = self.clients['other']
+        client.get(url)
+        client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}
+        ))
+        self.assertContains(client.get(url), 'Отписаться')
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def compute(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return 'значение'
+
+    def test_concurrent_misses_compute_once(self):
+        """Одновременные промахи по холодному ключу считают значение раз."""
+        threads = 20
+        barrier = threading.Barrier(threads)
+
+        def fetch(_):
+            barrier.wait()
+            return single_flight('cold', self.compute, 60)
+
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(fetch, range(threads)))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['значение'] * threads)
+
+    def test_stale_value_served_while_recomputing(self):
+        """Пока один пересчитывает, остальные получают старое значение."""
+        store('stale', 'старое', -1)
+        cache.add('stale:lock', True)
+        self.assertEqual(single_flight('stale', self.compute, 60), 'старое')
+        self.assertEqual(self.calls, 0)
+        cache.delete('stale:lock')
+        self.assertEqual(single_flight('stale', self.compute, 60), 'значение')
+
+
+class LookupCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hot_lookups_skip_database(self):
+        """Повторный поиск пользователя, группы и поста не ходит в базу."""
+        lookups.get_user_or_404('author')
+        lookups.get_group_or_404('test')
+        lookups.get_post_or_404(self.post.pk)
+        with self.assertNumQueries(0):
+            user = lookups.get_user_or_404('author')
+            group = lookups.get_group_or_404('test')
+            post = lookups.get_post_or_404(self.post.pk)
+            self.assertEqual(user.counters.posts_count, 1)
+            self.assertEqual(group.posts_count, 1)
+            self.assertEqual(post.author, self.user)
+            self.assertEqual(post.group, self.group)
+            self.assertEqual(user.get_full_name(), '')
+            self.assertEqual(post.author.username, 'author')
+
+    def test_changes_invalidate_lookups(self):
+        """Правки, переименования и счётчики сбрасывают записи кеша."""
+        lookups.get_user_or_404('author')
+        lookups.get_group_or_404('test')
+        lookups.get_post_or_404(self.post.pk)
+        Group.objects.filter(pk=self.group.pk).update(slug='renamed')
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        self.assertEqual(
+            lookups.get_group_or_404('renamed').title, 'Новое название'
+        )
+        self.assertEqual(
+            lookups.get_post_or_404(self.post.pk).group.title,
+            'Новое название'
+        )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Тестовый коммент'
+        )
+        self.assertEqual(
+            lookups.get_post_or_404(self.post.pk).comments_count, 1
+        )
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(
+            lookups.get_user_or_404('author').counters.followers_count, 1
+        )
+
+    def test_stale_natural_key_is_not_served(self):
+        """По прежнему имени переименованный пользователь не находится."""
+        lookups.get_user_or_404('reader')
+        user = User.objects.get(username='reader')
+        user.username = 'renamed'
+        user.save()
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': 'reader'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_missing_lookups_are_remembered(self):
+        """Повторный запрос несуществующего объекта не ходит в базу."""
+        lookups_404 = (
+            (lookups.get_user_or_404, 'ghost'),
+            (lookups.get_group_or_404, 'ghost'),
+            (lookups.get_post_or_404, self.post.pk + 100),
+        )
+        for lookup, key in lookups_404:
+            with self.assertRaises(Http404):
+                lookup(key)
+        with self.assertNumQueries(0):
+            for lookup, key in lookups_404:
+                with self.subTest(lookup=lookup.__name__):
+                    with self.assertRaises(Http404):
+                        lookup(key)
+
+    def test_private_user_fields_not_cached(self):
+        """Хеш пароля и email пользователя не попадают в кеш."""
+        for lookup, key in (
+            (lookups.get_user_or_404, 'author'),
+            (lookups.get_post_or_404, self.post.pk),
+        ):
+            with self.subTest(lookup=lookup.__name__):
+                cache.clear()
+                lookup(key)
+                cached = cache.get(lookups.user_key(self.user.pk))
+                self.assertEqual(cached.username, 'author')
+                self.assertNotIn('password', cached.__dict__)
+                self.assertNotIn('email', cached.__dict__)
+
+    def test_created_objects_clear_missing_marks(self):
+        """Созданные пользователь, группа и пост сразу находятся."""
+        missing_pk = self.post.pk + 1
+        for lookup, key in (
+            (lookups.get_user_or_404, 'ghost'),
+            (lookups.get_group_or_404, 'ghost'),
+            (lookups.get_post_or_404, missing_pk),
+        ):
+            with self.assertRaises(Http404):
+                lookup(key)
+        User.objects.create_user(username='ghost')
+        Group.objects.create(
+            title='Новая группа', slug='ghost', description='Описание'
+        )
+        post = Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(post.pk, missing_pk)
+        self.assertEqual(lookups.get_user_or_404('ghost').username, 'ghost')
+        self.assertEqual(lookups.get_group_or_404('ghost').slug, 'ghost')
+        self.assertEqual(lookups.get_post_or_404(missing_pk), post)
+        with self.assertRaises(Http404):
+            lookups.get_post_or_404(missing_pk + 1)
+        with self.assertRaises(Http404):
+            lookups.get_post_or_404(missing_pk + 100)
+        Post.objects.bulk_create([Post(author=self.user, text='Пачка')])
+        self.assertEqual(
+            lookups.get_post_or_404(missing_pk + 1).text, 'Пачка'
+        )
@@ -0,0 +1,105 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post, PostCard
+
+User = get_user_model()
+
+
+class PostCardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Тестовый пост'
+        )
+
+    def card(self):
+        return PostCard.objects.get(pk=self.post.pk)
+
+    def test_card_follows_post(self):
+        """Карточка создаётся, правится и удаляется вместе с постом."""
+        card = self.card()
+        self.assertEqual(card.text, 'Тестовый пост')
+        self.assertEqual(card.author_username, 'author')
+        self.assertEqual(card.author_full_name, 'Лев Толстой')
+        self.assertEqual(card.group_slug, 'test')
+        self.assertEqual(card.group_title, 'Тестовая группа')
+        self.assertEqual(card.card_version, self.post.card_version)
+        self.post.text = 'Исправленный пост'
+        self.post.group = None
+        self.post.save()
+        card = self.card()
+        self.assertEqual(card.text, 'Исправленный пост')
+        self.assertEqual(card.group_slug, '')
+        self.post.delete()
+        self.assertFalse(PostCard.objects.exists())
+
+    def test_card_follows_author_and_group(self):
+        """Переименование автора и группы попадает в карточки."""
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Алексей'
+        user.save()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.title = 'Новое название'
+        group.save()
+        card = self.card()
+        self.assertEqual(card.author_full_name, 'Алексей Толстой')
+        self.assertEqual(card.group_slug, 'renamed')
+        self.assertEqual(card.group_title, 'Новое название')
+        group.delete()
+        card = self.card()
+        self.assertIsNone(card.group_id)
+        self.assertEqual(card.group_slug, '')
+
+    def test_bulk_created_posts_get_cards(self):
+        """Посты из bulk_create тоже получают карточки."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'Пост {i}') for i in range(3)
+        ])
+        self.assertEqual(PostCard.objects.count(), 4)
+
+    def test_rebuild_command(self):
+        """Команда rebuild_post_cards пересоздаёт карточки."""
+        PostCard.objects.all().delete()
+        call_command('rebuild_post_cards', stdout=StringIO())
+        self.assertEqual(self.card().text, 'Тестовый пост')
+
+    def test_feeds_read_cards_without_joins(self):
+        """Ленты читают карточки одним запросом без соединений."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'test'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = Client().get(url)
+                self.assertContains(response, 'Лев Толстой')
+                selects = [
+                    query['sql'] for query in queries
+                    if 'FROM "posts_postcard"' in query['sql']
+                    and 'COUNT' not in query['sql']
+                ]
+                self.assertEqual(len(selects), 1)
+                self.assertNotIn('JOIN', selects[0])
@@ -0,0 +1,129 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, GroupSubscription, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTests.reader)
+
+    def revalidate(self, client, url):
+        """Первый ответ и ответ на повторный запрос с его валидаторами."""
+        response = client.get(url)
+        return response, client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+    def test_unchanged_pages_answer_not_modified(self):
+        """Неизменённые страницы отвечают 304 без тела."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'test'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for client in (self.guest_client, self.authorized_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    response, repeated = self.revalidate(client, url)
+                    self.assertTrue(response.has_header('Last-Modified'))
+                    self.assertEqual(repeated.status_code, 304)
+                    self.assertEqual(repeated.content, b'')
+                    repeated = client.get(
+                        url,
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                    )
+                    self.assertEqual(repeated.status_code, 304)
+
+    def test_changes_refresh_validators(self):
+        """Правка поста и комментарий меняют ETag страниц."""
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        index = reverse('posts:index')
+        first_detail = self.guest_client.get(detail)['ETag']
+        first_index = self.guest_client.get(index)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Тестовый коммент'
+        )
+        response = self.guest_client.get(
+            detail, HTTP_IF_NONE_MATCH=first_detail
+        )
+        self.assertEqual(response.status_code, 200)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        response = self.guest_client.get(index, HTTP_IF_NONE_MATCH=first_index)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый текст')
+
+    def test_validators_depend_on_user(self):
+        """ETag различается для пользователей и меняется с их подписками."""
+        url = reverse('posts:group_posts', kwargs={'slug': 'test'})
+        guest_etag = self.guest_client.get(url)['ETag']
+        user_etag = self.authorized_client.get(url)['ETag']
+        self.assertNotEqual(guest_etag, user_etag)
+        GroupSubscription.objects.create(user=self.reader, group=self.group)
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=user_etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_feed_tracks_followed_authors(self):
+        """Лента подписок обновляется с подписками и постами авторов."""
+        url = reverse('posts:follow_index')
+        response, repeated = self.revalidate(self.authorized_client, url)
+        self.assertEqual(repeated.status_code, 304)
+        Follow.objects.create(user=self.reader, author=self.user)
+        response, repeated = self.revalidate(self.authorized_client, url)
+        self.assertNotEqual(response.status_code, 304)
+        self.assertEqual(repeated.status_code, 304)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertContains(response, 'Свежий пост')
+
+    def test_validators_change_after_relogin(self):
+        """После нового входа страница с формой отдаётся заново."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.authorized_client.get(url)
+        self.authorized_client.logout()
+        self.authorized_client.force_login(self.reader)
+        # Last-Modified с точностью до секунды: вход — секундой позже.
+        User.objects.filter(pk=self.reader.pk).update(
+            last_login=timezone.now() + timedelta(seconds=1)
+        )
+        repeated = self.authorized_client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(repeated.status_code, 200)
+        repeated = self.authorized_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(repeated.status_code, 200)
@@ -0,0 +1,101 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        cls.group2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test2',
+            description='Тестовое описание 2',
+        )
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счётчики."""
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='Тестовый пост'
+        )
+        self.assertEqual(self.counters(self.user).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.group2
+        post.save()
+        self.group.refresh_from_db()
+        self.group2.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.group2.posts_count, 1)
+        post.delete()
+        self.group2.refresh_from_db()
+        self.assertEqual(self.counters(self.user).posts_count, 0)
+        self.assertEqual(self.group2.posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки меняют счётчики."""
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Тестовый коммент'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(self.counters(self.user).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.counters(self.user).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_rebuild_command(self):
+        """Команда rebuild_counters восстанавливает счётчики."""
+        Post.objects.bulk_create([
+            Post(author=self.user, group=self.group, text=f'Пост {i}')
+            for i in range(3)
+        ])
+        Follow.objects.create(user=self.reader, author=self.user)
+        UserCounters.objects.all().delete()
+        Group.objects.update(posts_count=0)
+        call_command('rebuild_counters', stdout=StringIO())
+        counters = self.counters(self.user)
+        self.assertEqual(counters.posts_count, 3)
+        self.assertEqual(counters.followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+
+    def test_stale_counters_do_not_go_negative(self):
+        """Удаление при отставшем нулевом счётчике не падает."""
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='Тестовый пост'
+        )
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Тестовый коммент'
+        )
+        Post.objects.update(comments_count=0)
+        Group.objects.update(posts_count=0)
+        UserCounters.objects.update(posts_count=0)
+        comment.delete()
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.counters(self.user).posts_count, 0)
@@ -1,12 +1,16 @@
+import os
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Group, Post
 
@@ -174,3 +178,102 @@ class PostTests(TestCase):
         )
         self.assertRedirects(response, redirect_url)
         self.assertEqual(test_post.comments.all().count(), comments_count)
+
+
+def jpeg_with_exif(width, height):
+    """JPEG заданного размера с EXIF: камера и поворот."""
+    exif = Image.Exif()
+    exif[0x0110] = 'Тестовая камера'
+    exif[0x0112] = 6
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(
+        buffer, 'JPEG', exif=exif.tobytes()
+    )
+    return SimpleUploadedFile('photo.jpeg', buffer.getvalue(), 'image/jpeg')
+
+
+def noisy_png(width, height):
+    """PNG из шума: почти не сжимается, verify() читает его до конца."""
+    noise = os.urandom(width * height * 3)
+    buffer = BytesIO()
+    Image.frombytes('RGB', (width, height), noise).save(buffer, 'PNG')
+    return SimpleUploadedFile('noise.png', buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(ImageUploadTests.user)
+
+    def create(self, image):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с фото', 'image': image,
+        })
+
+    def test_image_is_downscaled_and_stripped(self):
+        """Картинка уменьшается, поворачивается и теряет EXIF."""
+        with mock.patch('posts.post_settings.IMAGE_MAX_SIDE', 100):
+            self.create(jpeg_with_exif(400, 200))
+        post = Post.objects.get(text='Пост с фото')
+        self.assertRegex(
+            post.image.name, r'^posts/\w\w/\w\w/[0-9a-f]{64}\.jpg$'
+        )
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (50, 100))
+            self.assertFalse(image.getexif())
+
+    def test_limits_are_checked_before_decoding(self):
+        """Слишком большие файлы и картинки отклоняются без декодирования."""
+        limits = (
+            (
+                'posts.post_settings.IMAGE_MAX_BYTES', 1024, 'too_large',
+                jpeg_with_exif
+            ),
+            (
+                'posts.post_settings.IMAGE_MAX_BYTES', 1024, 'too_large',
+                noisy_png
+            ),
+            (
+                'posts.post_settings.IMAGE_MAX_PIXELS', 10_000,
+                'too_many_pixels', jpeg_with_exif
+            ),
+        )
+        for setting, limit, code, make_image in limits:
+            with self.subTest(setting=setting, image=make_image.__name__):
+                image = make_image(400, 200)
+                with mock.patch(setting, limit), mock.patch(
+                    'PIL.Image.Image.load'
+                ) as load:
+                    response = self.create(image)
+                load.assert_not_called()
+                self.assertFalse(
+                    Post.objects.filter(text='Пост с фото').exists()
+                )
+                self.assertTrue(
+                    response.context['form'].has_error('image', code)
+                )
+
+    def test_admin_rejects_oversized_image(self):
+        """Админка не сохраняет картинку больше лимита, даже обрезанной."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        self.client.force_login(admin)
+        with mock.patch('posts.post_settings.IMAGE_MAX_BYTES', 1024):
+            response = self.client.post(reverse('admin:posts_post_add'), {
+                'text': 'Пост с фото',
+                'author': admin.pk,
+                'image': jpeg_with_exif(400, 200),
+            })
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(Post.objects.filter(text='Пост с фото').exists())
+        self.assertTrue(
+            response.context['adminform'].form.has_error('image', 'too_large')
+        )
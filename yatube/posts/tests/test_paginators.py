@@ -0,0 +1,127 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Post
+from ..paginators import (BoundedPaginator, KeysetPage, KeysetPaginator,
+                          decode_cursor)
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        for i in range(25):
+            Post.objects.create(author=cls.user, text=f'Тестовый пост {i}')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_pages_cover_feed_without_gaps(self):
+        """Листание по after проходит всю ленту без пропусков и дублей."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        page = paginator.get_page_by_cursor()
+        seen = list(page)
+        while page.has_next():
+            page = paginator.get_page_by_cursor(after=page.next_token)
+            seen.extend(page)
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(page), 5)
+        self.assertTrue(page.has_previous())
+
+    def test_before_returns_previous_page(self):
+        """Курсор before возвращает предыдущую страницу целиком."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        first = paginator.get_page_by_cursor()
+        second = paginator.get_page_by_cursor(after=first.next_token)
+        back = paginator.get_page_by_cursor(before=second.previous_token)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_broken_token_returns_first_page(self):
+        """Битый токен не роняет страницу, а открывает первую."""
+        self.assertIsNone(decode_cursor('не-токен'))
+        response = self.guest_client.get(
+            reverse('posts:index'), {'after': 'broken'}
+        )
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj, KeysetPage)
+        self.assertEqual(len(page_obj), 10)
+        self.assertFalse(page_obj.has_previous())
+
+    def test_views_switch_to_keyset_mode(self):
+        """Ленты переходят в курсорный режим по параметру after."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url, {'after': ''})
+                token = first.context['page_obj'].next_token
+                response = self.guest_client.get(url, {'after': token})
+                self.assertEqual(len(response.context['page_obj']), 10)
+                self.assertContains(response, '?before=')
+
+
+class BoundedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        for i in range(3):
+            Post.objects.create(author=cls.user, text=f'Тестовый пост {i}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_window(self):
+        """Окно страниц ограничено краями и соседями текущей."""
+        paginator = BoundedPaginator(Post.objects.all(), 1, window=1)
+        paginator.count = 50
+        self.assertEqual(
+            paginator.get_page_window(25), [1, None, 24, 25, 26, None, 50]
+        )
+        self.assertEqual(paginator.get_page_window(2), [1, 2, 3, None, 50])
+        self.assertEqual(paginator.get_page_window(50), [1, None, 49, 50])
+
+    def test_count_is_cached_until_post_created(self):
+        """Количество постов кешируется и сбрасывается при создании поста."""
+        BoundedPaginator(Post.objects.all(), 10, count_key='index').count
+        with self.assertNumQueries(0):
+            paginator = BoundedPaginator(
+                Post.objects.all(), 10, count_key='index'
+            )
+            self.assertEqual(paginator.count, 3)
+        Post.objects.create(author=self.user, text='Новый пост')
+        paginator = BoundedPaginator(Post.objects.all(), 10, count_key='index')
+        self.assertEqual(paginator.count, 4)
+
+    def test_follow_count_not_reset_per_follower(self):
+        """Пост автора меняет счётчик ленты подписок без сброса по ключам."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:follow_index')
+        self.assertEqual(
+            client.get(url).context['page_obj'].paginator.count, 3
+        )
+        with mock.patch.object(
+            cache, 'delete_many', wraps=cache.delete_many
+        ) as delete_many:
+            Post.objects.create(author=self.user, text='Новый пост')
+        deleted = [key for call in delete_many.call_args_list
+                   for key in call[0][0]]
+        self.assertFalse([key for key in deleted if 'follow' in key])
+        self.assertEqual(
+            client.get(url).context['page_obj'].paginator.count, 4
+        )
@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from about import urls as about_urls
+from users import urls as users_urls
+
+from .. import urls as posts_urls
+from ..models import Comment, Follow, Group, GroupSubscription, Post
+from .query_budget import query_budget
+
+User = get_user_model()
+
+# Бюджет запросов для каждой страницы: (аноним, авторизованный).
+BUDGETS = {
+    'posts:index': (2, 4),
+    'posts:post_create': (0, 3),
+    'posts:profile': (3, 6),
+    'posts:post_detail': (2, 4),
+    'posts:post_edit': (0, 5),
+    'posts:add_comment': (0, 3),
+    'posts:group_posts': (3, 6),
+    'posts:group_subscribe': (0, 4),
+    'posts:group_unsubscribe': (0, 5),
+    'posts:follow_index': (0, 6),
+    'posts:personal_feed': (0, 7),
+    'posts:search': (0, 2),
+    'posts:profile_follow': (0, 13),
+    'posts:profile_unfollow': (0, 10),
+    'users:logout': (0, 4),
+    'users:signup': (0, 2),
+    'users:password_change': (0, 2),
+    'users:password_change_done': (0, 2),
+    'users:login': (0, 2),
+    'about:author': (0, 2),
+    'about:tech': (0, 2),
+}
+
+
+def url_names():
+    """Имена всех страниц приложений posts, users и about."""
+    for module in (posts_urls, users_urls, about_urls):
+        for pattern in module.urlpatterns:
+            yield f'{module.app_name}:{pattern.name}'
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{i}', first_name='Имя', last_name='Фамилия'
+            ) for i in range(5)
+        ]
+        cls.reader = User.objects.create_user(username='reader')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}',
+                slug=f'group{i}',
+                description='Тестовое описание',
+            ) for i in range(3)
+        ]
+        cls.post = Post.objects.create(author=cls.reader, text='Свой пост')
+        posts = [cls.post] + [
+            Post.objects.create(
+                author=cls.authors[i % 5],
+                group=cls.groups[i % 3] if i % 4 else None,
+                text=f'Тестовый пост {i}',
+            ) for i in range(40)
+        ]
+        for post in posts:
+            for author in cls.authors[:3]:
+                Comment.objects.create(
+                    post=post, author=author, text='Тестовый коммент'
+                )
+        for author in cls.authors[:3]:
+            Follow.objects.create(user=cls.reader, author=author)
+        GroupSubscription.objects.create(user=cls.reader, group=cls.groups[0])
+        cls.kwargs = {
+            'username': cls.authors[4].username,
+            'post_id': cls.post.pk,
+            'slug': cls.groups[0].slug,
+        }
+
+    def url(self, name):
+        route = self.route(name)
+        return reverse(name, kwargs={
+            key: value for key, value in self.kwargs.items()
+            if f':{key}>' in route
+        })
+
+    @staticmethod
+    def route(name):
+        app_name, url_name = name.split(':')
+        module = {
+            'posts': posts_urls, 'users': users_urls, 'about': about_urls
+        }[app_name]
+        for pattern in module.urlpatterns:
+            if pattern.name == url_name:
+                return str(pattern.pattern)
+
+    def test_every_page_has_budget(self):
+        """Для каждой страницы задан бюджет запросов."""
+        self.assertEqual(set(url_names()), set(BUDGETS))
+
+    def test_pages_fit_query_budget(self):
+        """Страницы укладываются в бюджет запросов."""
+        for name in url_names():
+            anonymous, authorized = BUDGETS[name]
+            for budget, user in ((anonymous, None), (authorized, self.reader)):
+                client = Client()
+                if user is not None:
+                    client.force_login(user)
+                url = self.url(name)
+                cache.clear()
+                with self.subTest(url=url, user=user):
+                    with query_budget(budget, label=url):
+                        client.get(url)
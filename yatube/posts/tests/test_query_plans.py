@@ -0,0 +1,123 @@
+import re
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import encode_cursor
+
+User = get_user_model()
+
+# Полный проход по таблице без индекса: «SCAN posts_post», а в SQLite
+# старше 3.36 — «SCAN TABLE posts_post». Проход по индексу
+# («... USING INDEX ...») полным не считается.
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+# Любой доступ к таблице: по нему видно, что план вообще разобран.
+TABLE_ACCESS = re.compile(r'^(?:SCAN|SEARCH) (?:TABLE )?(\w+)')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Поиск по индексу от курсора, а не от начала ленты.
+RANGE_SEEK = re.compile(r'^SEARCH .*pub_date[<>]\?')
+# Запросы слияния источников: сортируют не больше страницы ключей
+# с каждого источника.
+MERGE_QUERY = re.compile(r'^SELECT \* FROM \(SELECT \* FROM |"id" IN \(\d')
+
+
+def query_plan(sql):
+    """Строки EXPLAIN QUERY PLAN для запроса SQLite."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        for i in range(15):
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Тестовый пост {i}'
+            )
+        cls.post = Post.objects.first()
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Тестовый коммент'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryPlanTests.reader)
+
+    def assert_indexed(self, url, params=None, cursor=False):
+        """
+        Запросы страницы url идут по индексам. С cursor=True хотя бы
+        один из них ищет от курсора по диапазону дат. Сортировка
+        разрешена только запросам слияния: их строк не больше страницы
+        с каждого источника.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params)
+        parsed = 0
+        seeks = 0
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'posts_' not in sql:
+                continue
+            for step in query_plan(sql):
+                parsed += bool(TABLE_ACCESS.match(step))
+                seeks += bool(RANGE_SEEK.match(step))
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertIsNone(FULL_SCAN.match(step))
+                    if not MERGE_QUERY.search(sql):
+                        self.assertNotIn(TEMP_SORT, step)
+        self.assertGreater(parsed, 0, f'План запросов {url} не разобран')
+        if cursor:
+            self.assertGreater(seeks, 0, f'{url} не ищет от курсора')
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент идут по индексам без полного прохода и сортировки."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'test'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            self.assert_indexed(url)
+            self.assert_indexed(url, {'page': 2})
+            self.assert_indexed(url, {'after': ''})
+
+    def test_cursor_pages_use_index_ranges(self):
+        """Страницы от настоящего курсора ищут по индексу от него."""
+        token = encode_cursor(
+            Post.objects.order_by('-pub_date', '-id')[7]
+        )
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': 'test'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:follow_index'),
+            reverse('posts:personal_feed'),
+        ]
+        for url in urls:
+            for direction in ('after', 'before'):
+                self.assert_indexed(url, {direction: token}, cursor=True)
+        # Лента с популярным автором сливает источники.
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 0):
+            url = reverse('posts:follow_index')
+            self.assert_indexed(url)
+            for direction in ('after', 'before'):
+                self.assert_indexed(url, {direction: token}, cursor=True)
@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import FTS_TABLE, PostSearch, match_expression
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Коты и коты: всё о котах'
+        )
+        cls.dog = Post.objects.create(
+            author=cls.user, text='Собака гуляла с котом'
+        )
+        Post.objects.create(author=cls.user, text='Про погоду')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query):
+        return list(PostSearch(query)[:10])
+
+    def test_match_expression(self):
+        """Слова запроса превращаются в префиксы основ."""
+        self.assertEqual(match_expression('Котами!'), '"кот"*')
+        self.assertEqual(match_expression('  '), '')
+
+    def test_results_ranked_and_stemmed(self):
+        """Поиск учитывает словоформы и сортирует по релевантности."""
+        self.assertEqual(self.search('котами'), [self.cats, self.dog])
+        self.assertEqual(self.search('собаки гуляли'), [self.dog])
+        self.assertEqual(self.search('кошелёк'), [])
+
+    def test_index_follows_edit_and_delete(self):
+        """Триггеры обновляют индекс при правке и удалении поста."""
+        dog = Post.objects.get(pk=self.dog.pk)
+        dog.text = 'Собака гуляла одна'
+        dog.save()
+        self.assertEqual(self.search('кот'), [self.cats])
+        self.assertEqual(self.search('одна'), [dog])
+        Post.objects.filter(pk=self.cats.pk).delete()
+        self.assertEqual(self.search('кот'), [])
+
+    def test_yo_folded_in_index_and_query(self):
+        """Слова с ё находятся и через е, и через ё."""
+        tree = Post.objects.create(author=self.user, text='Ёлка в лесу')
+        self.assertEqual(self.search('елки'), [tree])
+        self.assertEqual(self.search('ёлка'), [tree])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('елка'), [tree])
+        tree.text = 'Ёлочка в лесу'
+        tree.save()
+        self.assertEqual(self.search('ёлочку'), [tree])
+        tree.delete()
+        self.assertEqual(self.search('елка'), [])
+
+    def test_rebuild_command(self):
+        """Команда rebuild_search_index восстанавливает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')"
+            )
+        self.assertEqual(self.search('погода'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('погода')), 1)
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты."""
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'собака'}
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.dog])
+        self.assertEqual(response.context['query'], 'собака')
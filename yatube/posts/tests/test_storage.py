@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import lookups
+from ..models import Post, PostCard
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def stored_files(self):
+        return [
+            os.path.relpath(os.path.join(root, name), TEMP_MEDIA_ROOT)
+            for root, _, names in os.walk(
+                os.path.join(TEMP_MEDIA_ROOT, 'posts')
+            )
+            for name in names
+        ]
+
+    def test_same_image_is_stored_once(self):
+        """Одинаковые картинки разных постов — один файл."""
+        posts = [
+            Post.objects.create(
+                author=self.user,
+                text=f'Репост {i}',
+                image=SimpleUploadedFile(
+                    f'meme{i}.gif', SMALL_GIF, 'image/gif'
+                ),
+            ) for i in range(3)
+        ]
+        self.assertEqual(len({post.image.name for post in posts}), 1)
+        self.assertRegex(
+            posts[0].image.name,
+            r'^posts/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.gif$'
+        )
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_migrate_command_moves_existing_media(self):
+        """Команда migrate_post_images переносит старые файлы порциями."""
+        legacy = FileSystemStorage(location=TEMP_MEDIA_ROOT)
+        flat_hashed = 'posts/' + 'ab' * 32 + '.gif'
+        for name in ('posts/cat.gif', 'posts/cat_copy.gif', flat_hashed):
+            legacy.save(name, ContentFile(SMALL_GIF))
+            Post.objects.create(author=self.user, text=name, image=name)
+        call_command(
+            'migrate_post_images',
+            batch_size=1, delete_old=True, stdout=StringIO()
+        )
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(
+            set(PostCard.objects.values_list('image', flat=True)), names
+        )
+        self.assertEqual(self.stored_files(), list(names))
+        self.assertFalse(
+            Post.objects.filter(thumbnail_url='').exists()
+        )
+
+    def test_migrate_command_forgets_posts_without_thumbnails(self):
+        """Кеш поста сбрасывается, даже если миниатюры не создались."""
+        cache.clear()
+        FileSystemStorage(location=TEMP_MEDIA_ROOT).save(
+            'posts/cat.gif', ContentFile(SMALL_GIF)
+        )
+        post = Post.objects.create(
+            author=self.user, text='Кот', image='posts/cat.gif'
+        )
+        lookups.get_post_or_404(post.pk)
+        with mock.patch(
+            'posts.thumbnails.generate_all', return_value=False
+        ):
+            call_command(
+                'migrate_post_images', delete_old=True, stdout=StringIO()
+            )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, 'posts/cat.gif')
+        self.assertEqual(
+            lookups.get_post_or_404(post.pk).image.name, post.image.name
+        )
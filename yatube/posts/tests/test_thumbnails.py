@@ -0,0 +1,175 @@
+import shutil
+import tempfile
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.images import ImageFile
+
+from .. import thumbnails
+from ..models import Post, PostCard
+from ..storage import legacy_images
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        # Одинаковые картинки хранятся одним файлом: миниатюры прошлого
+        # теста достались бы этому.
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.client = Client()
+        self.client.force_login(ThumbnailTests.user)
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_page_shows_placeholder_until_ready(self):
+        """Пока миниатюры нет, страница не ищет её и показывает заглушку."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        # Отложенная генерация после ответа здесь не сообщает о готовности.
+        backend = thumbnails.backend
+        with mock.patch.object(thumbnails.thumbnails_ready, 'send'):
+            with mock.patch.object(backend, 'get_ready_thumbnail') as lookup:
+                response = self.client.get(url)
+        lookup.assert_not_called()
+        self.assertContains(response, 'Изображение обрабатывается')
+        thumbnails.schedule(self.post.image)
+        thumbnails.generate_pending()
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+        self.assertContains(
+            response,
+            'width="960" height="339" loading="lazy" decoding="async"'
+        )
+        self.assertContains(response, '640w')
+
+    def test_create_schedules_thumbnails(self):
+        """Создание поста с картинкой ставит миниатюры в очередь."""
+        with mock.patch('posts.views.schedule_thumbnails') as schedule:
+            self.client.post(reverse('posts:post_create'), {
+                'text': 'Новый пост',
+                'image': SimpleUploadedFile(
+                    'new.gif', SMALL_GIF, 'image/gif'
+                ),
+            })
+        post = Post.objects.get(text='Новый пост')
+        schedule.assert_called_once_with(post.image)
+
+    def test_thumbnails_generated_after_response(self):
+        """Отложенные миниатюры создаются после ответа на запрос."""
+        url = reverse('posts:index')
+        self.assertContains(
+            self.client.get(url), 'Изображение обрабатывается'
+        )
+        thumbnail = thumbnails.ready_thumbnail(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(
+            PostCard.objects.get(pk=self.post.pk).thumbnail_url, thumbnail.url
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.thumbnail_url, thumbnail.url)
+        self.assertEqual(
+            (post.thumbnail_width, post.thumbnail_height), (960, 339)
+        )
+        self.assertEqual(
+            [candidate.split()[1]
+             for candidate in post.thumbnail_srcset.split(', ')],
+            ['320w', '640w', '960w']
+        )
+        self.assertNotContains(
+            self.client.get(url), 'Изображение обрабатывается'
+        )
+
+    def test_placeholder_schedules_missing_thumbnails(self):
+        """Показ заглушки ставит в очередь миниатюры старого поста."""
+        # Пост из времён до полей миниатюр: в очереди его картинки нет.
+        thumbnails._pending.names = set()
+        self.assertContains(
+            self.client.get(reverse('posts:index')),
+            'Изображение обрабатывается'
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertTrue(post.thumbnail_url)
+
+    def test_migration_fills_fields_from_ready_thumbnails(self):
+        """Миграция берёт поля из готовых миниатюр и не создаёт новых."""
+        migration = import_module(
+            'posts.migrations.0020_post_thumbnail_srcset'
+        )
+        thumbnails.generate_all(self.post.image.name)
+        empty = {'thumbnail_url': '', 'thumbnail_srcset': ''}
+        Post.objects.update(**empty)
+        PostCard.objects.update(**empty)
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            migration.fill_thumbnail_fields(apps, None)
+        schedule.assert_not_called()
+        url = thumbnails.ready_thumbnail(self.post.image).url
+        self.assertEqual(Post.objects.get().thumbnail_url, url)
+        self.assertEqual(PostCard.objects.get().thumbnail_url, url)
+
+    def test_migration_finds_legacy_thumbnails(self):
+        """Миниатюры тега thumbnail ищутся под именами прежнего хранилища."""
+        migration = import_module(
+            'posts.migrations.0020_post_thumbnail_srcset'
+        )
+        # Так миниатюру создавал тег шаблона до хранилища по хешу.
+        geometry, options = thumbnails.GEOMETRIES['card']
+        legacy = ThumbnailBackend().get_thumbnail(
+            ImageFile(self.post.image.name, legacy_images), geometry,
+            **options
+        )
+        self.assertIsNone(thumbnails.ready_thumbnail(
+            self.post.image, schedule_missing=False
+        ))
+        empty = {'thumbnail_url': '', 'thumbnail_srcset': ''}
+        Post.objects.update(**empty)
+        PostCard.objects.update(**empty)
+        migration.fill_thumbnail_fields(apps, None)
+        post = Post.objects.get()
+        self.assertEqual(post.thumbnail_url, legacy.url)
+        self.assertEqual(
+            (post.thumbnail_width, post.thumbnail_height), (960, 339)
+        )
+        self.assertEqual(post.thumbnail_srcset, f'{legacy.url} 960w')
+        self.assertEqual(PostCard.objects.get().thumbnail_url, legacy.url)
+
+    def test_generate_command(self):
+        """Команда generate_thumbnails создаёт миниатюры в пуле процессов."""
+        call_command('generate_thumbnails', workers=2, stdout=StringIO())
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            thumbnail = thumbnails.ready_thumbnail(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        schedule.assert_not_called()
@@ -0,0 +1,248 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import connection
+from django.db.models import Q
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Group, GroupSubscription, Post, TimelineEntry
+from ..paginators import MergedPaginator
+from ..timeline import follow_feed, personal_feed_sources
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        Post.objects.create(author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(TimelineTests.reader)
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка добавляет посты автора в ленту, отписка убирает."""
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}
+        ))
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 1
+        )
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author'}
+        ))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        Post.objects.create(author=self.other, text='Чужой пост')
+        entry = TimelineEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Новый пост', 'Старый пост']
+        )
+
+    def test_bulk_created_posts_reach_timeline(self):
+        """Посты из bulk_create тоже попадают в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Пост {i}') for i in range(3)
+        ])
+        posts, _ = follow_feed(self.reader)
+        self.assertEqual(posts.count(), 4)
+
+    def test_bulk_create_writes_only_new_posts(self):
+        """bulk_create разносит только новые посты и не популярных авторов."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.filter(user=self.reader).delete()
+        Post.objects.bulk_create([Post(author=self.author, text='Новый')])
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=self.reader
+            ).values_list('post__text', flat=True)),
+            ['Новый']
+        )
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 0):
+            Post.objects.bulk_create([Post(author=self.author, text='Хит')])
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__text='Хит').exists()
+        )
+
+    def test_backfill_after_unfollow_is_deferred(self):
+        """Догоняющее заполнение лент идёт после ответа, а не в запросе."""
+        Follow.objects.create(user=self.other, author=self.author)
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 1):
+            Follow.objects.create(user=self.reader, author=self.author)
+            self.assertFalse(
+                TimelineEntry.objects.filter(user=self.reader).exists()
+            )
+            with mock.patch(
+                'posts.signals.FANOUT_LIMIT', 1
+            ), mock.patch('posts.timeline.backfill_followers') as backfill:
+                Follow.objects.get(user=self.other).delete()
+                backfill.assert_not_called()
+                request_finished.send(sender=self.__class__)
+                backfill.assert_called_once_with(self.author.pk)
+
+    def test_celebrity_posts_are_pulled(self):
+        """Посты популярного автора не разносятся, а читаются напрямую."""
+        Follow.objects.create(user=self.other, author=self.author)
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 1):
+            Follow.objects.create(user=self.reader, author=self.author)
+            post = Post.objects.create(author=self.author, text='Хит')
+            self.assertFalse(post.timeline_entries.exists())
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Хит', 'Старый пост']
+        )
+
+    def test_celebrity_feed_pages_in_order(self):
+        """Лента с популярным автором листается в порядке дат без повторов."""
+        Follow.objects.create(user=self.reader, author=self.other)
+        Follow.objects.create(user=self.other, author=self.author)
+        for i in range(8):
+            Post.objects.create(author=self.other, text=f'Пост {i}')
+        with mock.patch('posts.timeline.FANOUT_LIMIT', 1):
+            Follow.objects.create(user=self.reader, author=self.author)
+            for i in range(8):
+                Post.objects.create(author=self.author, text=f'Хит {i}')
+            expected = list(Post.objects.filter(
+                author__in=[self.author, self.other]
+            ).order_by('-pub_date', '-id'))
+            url = reverse('posts:follow_index')
+            page_obj = self.client.get(url).context['page_obj']
+            seen = list(page_obj)
+            while page_obj.has_next():
+                page_obj = self.client.get(
+                    url, {'after': page_obj.next_token}
+                ).context['page_obj']
+                seen.extend(page_obj)
+            back = self.client.get(
+                url, {'before': page_obj.previous_token}
+            ).context['page_obj']
+        self.assertEqual(seen, expected)
+        self.assertEqual(list(back), expected[:10])
+
+    def test_keyset_pages_over_timeline(self):
+        """Курсорная паджинация работает поверх материализованной ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        url = reverse('posts:follow_index')
+        first = self.client.get(url, {'after': ''}).context['page_obj']
+        second = self.client.get(
+            url, {'after': first.next_token}
+        ).context['page_obj']
+        self.assertEqual(len(first) + len(second), 13)
+        self.assertFalse(second.has_next())
+        self.assertFalse(set(first) & set(second))
+
+
+class PersonalFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тестовое описание',
+        )
+        for i in range(24):
+            Post.objects.create(
+                author=cls.authors[i % 3],
+                group=cls.group if i % 4 == 0 else None,
+                text=f'Тестовый пост {i}',
+            )
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+        Follow.objects.create(user=cls.reader, author=cls.authors[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(PersonalFeedTests.reader)
+
+    def test_subscribe_and_unsubscribe_group(self):
+        """Пользователь может подписаться на сообщество и отписаться."""
+        kwargs = {'slug': PersonalFeedTests.group.slug}
+        self.client.get(reverse('posts:group_subscribe', kwargs=kwargs))
+        self.assertTrue(GroupSubscription.objects.filter(
+            user=self.reader, group=self.group
+        ).exists())
+        self.client.get(reverse('posts:group_unsubscribe', kwargs=kwargs))
+        self.assertFalse(GroupSubscription.objects.exists())
+
+    def test_merged_feed_matches_combined_query(self):
+        """Слияние источников совпадает с единым запросом и без повторов."""
+        GroupSubscription.objects.create(user=self.reader, group=self.group)
+        expected = list(Post.objects.filter(
+            Q(author__in=self.authors[:2]) | Q(group=self.group)
+        ).order_by('-pub_date', '-id'))
+        url = reverse('posts:personal_feed')
+        page_obj = self.client.get(url).context['page_obj']
+        seen = list(page_obj)
+        while page_obj.has_next():
+            page_obj = self.client.get(
+                url, {'after': page_obj.next_token}
+            ).context['page_obj']
+            seen.extend(page_obj)
+        self.assertEqual(seen, expected)
+        back = self.client.get(
+            url, {'before': page_obj.previous_token}
+        ).context['page_obj']
+        last_page_start = len(expected) - len(page_obj)
+        self.assertEqual(
+            list(back), expected[last_page_start - 10:last_page_start]
+        )
+
+    def test_sources_merged_across_chunks(self):
+        """Источники сверх одного запроса сливаются в тот же порядок."""
+        GroupSubscription.objects.create(user=self.reader, group=self.group)
+        expected = list(Post.objects.filter(
+            Q(author__in=self.authors[:2]) | Q(group=self.group)
+        ).order_by('-pub_date', '-id'))
+        paginator = MergedPaginator(
+            Post.objects.for_feed(), personal_feed_sources(self.reader), 10
+        )
+        with mock.patch('posts.paginators.MERGE_CHUNK_SIZE', 1):
+            first = paginator.get_page_by_cursor()
+            second = paginator.get_page_by_cursor(after=first.next_token)
+        self.assertEqual(list(first) + list(second), expected[:20])
+
+    def test_queries_do_not_grow_with_sources(self):
+        """Страница личной ленты не делает запрос на каждую подписку."""
+        url = reverse('posts:personal_feed')
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            return len(queries)
+
+        expected = count_queries()
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        GroupSubscription.objects.create(user=self.reader, group=self.group)
+        for i in range(10):
+            author = User.objects.create_user(username=f'extra{i}')
+            Post.objects.create(author=author, text=f'Пост {i}')
+            Follow.objects.create(user=self.reader, author=author)
+        self.assertEqual(count_queries(), expected)
@@ -0,0 +1,179 @@
+import logging
+import threading
+
+from django.dispatch import Signal
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .storage import post_images
+
+logger = logging.getLogger(__name__)
+
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+# Миниатюры, которые показывают шаблоны: имя -> (геометрия, опции sorl).
+GEOMETRIES = {
+    'card': ('960x339', CARD_OPTIONS),
+    'card_640': ('640x226', CARD_OPTIONS),
+    'card_320': ('320x113', CARD_OPTIONS),
+}
+# Ширины карточки для srcset, от узкой к широкой.
+CARD_SRCSET = ('card_320', 'card_640', 'card')
+
+
+class PregeneratedBackend(ThumbnailBackend):
+    """
+    Бэкенд sorl, который разделяет поиск готовой миниатюры и её создание:
+    запрос страницы только ищет файл, а создаёт его фоновый обработчик.
+    """
+
+    def thumbnail_file(self, file_, geometry_string, storage=post_images,
+                       **options):
+        """
+        Исходник, файл миниатюры и итоговые опции, как в get_thumbnail.
+        Исходник читается из хранилища storage, по умолчанию из хранилища
+        картинок постов: имя миниатюры зависит от хранилища, и для картинки
+        поста и её имени строкой оно должно совпадать.
+        """
+        source = ImageFile(file_, storage)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return source, ImageFile(name, default.storage), options
+
+    def get_ready_thumbnail(self, file_, geometry_string, storage=post_images,
+                            **options):
+        """Готовая миниатюра или None, если файла ещё нет. Не декодирует."""
+        source, thumbnail, options = self.thumbnail_file(
+            file_, geometry_string, storage, **options
+        )
+        cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        if not thumbnail.exists():
+            return None
+        default.kvstore.get_or_set(source)
+        default.kvstore.set(thumbnail, source)
+        return thumbnail
+
+    def generate(self, file_, geometry_string, force=False, **options):
+        """
+        Создаёт файл миниатюры, не трогая kvstore: так обработчик
+        не ходит в базу и может работать в отдельном процессе.
+        """
+        source, thumbnail, options = self.thumbnail_file(
+            file_, geometry_string, **options
+        )
+        if thumbnail.exists() and not force:
+            return thumbnail
+        source_image = default.engine.get_image(source)
+        try:
+            options['image_info'] = default.engine.get_image_info(
+                source_image
+            )
+            source.set_size(default.engine.get_image_size(source_image))
+            self._create_thumbnail(
+                source_image, geometry_string, options, thumbnail
+            )
+            self._create_alternative_resolutions(
+                source_image, geometry_string, options, thumbnail.name
+            )
+        finally:
+            default.engine.cleanup(source_image)
+        return thumbnail
+
+
+backend = PregeneratedBackend()
+# Картинки, миниатюры которых создаются после ответа на текущий запрос.
+_pending = threading.local()
+# Отложенные миниатюры созданы: страницы с заглушками пора обновить.
+thumbnails_ready = Signal()
+
+
+def generate_all(name, force=False):
+    """
+    Создаёт все миниатюры из GEOMETRIES для файла name.
+    Возвращает False, если исходник не удалось обработать.
+    """
+    try:
+        for geometry, options in GEOMETRIES.values():
+            backend.generate(name, geometry, force=force, **options)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+        return False
+    return True
+
+
+def schedule(image):
+    """
+    Откладывает создание миниатюр image до конца запроса:
+    они создаются по request_finished, когда ответ уже отдан клиенту.
+    """
+    if not image:
+        return
+    if not hasattr(_pending, 'names'):
+        _pending.names = set()
+    _pending.names.add(image.name)
+
+
+def generate_pending(**kwargs):
+    """Создаёт миниатюры, отложенные за время запроса."""
+    names = getattr(_pending, 'names', set())
+    _pending.names = set()
+    ready = [name for name in sorted(names) if generate_all(name)]
+    if ready:
+        thumbnails_ready.send(sender=None, names=ready)
+
+
+def ready_thumbnail(image, size='card', schedule_missing=True,
+                    storage=post_images):
+    """
+    Готовая миниатюра image размера size или None.
+    Недостающие миниатюры откладываются, страница их не ждёт.
+    """
+    if not image:
+        return None
+    geometry, options = GEOMETRIES[size]
+    thumbnail = backend.get_ready_thumbnail(
+        image, geometry, storage, **options
+    )
+    if thumbnail is None and schedule_missing:
+        schedule(image)
+    return thumbnail
+
+
+def thumbnail_fields(image, size='card', srcset=CARD_SRCSET,
+                     schedule_missing=True, storage=post_images):
+    """
+    Поля поста с адресом, размерами и srcset готовых миниатюр image.
+    Пока миниатюры нет, поля пустые, а она ставится в очередь;
+    с schedule_missing=False только ищутся готовые файлы.
+    storage — хранилище исходника, от него зависят имена миниатюр.
+    """
+    thumbnail = ready_thumbnail(image, size, schedule_missing, storage)
+    if thumbnail is None:
+        return {
+            'thumbnail_url': '',
+            'thumbnail_width': None,
+            'thumbnail_height': None,
+            'thumbnail_srcset': '',
+        }
+    candidates = []
+    for name in srcset:
+        candidate = ready_thumbnail(image, name, schedule_missing, storage)
+        if candidate is not None:
+            candidates.append(f'{candidate.url} {candidate.width}w')
+    return {
+        'thumbnail_url': thumbnail.url,
+        'thumbnail_width': thumbnail.width,
+        'thumbnail_height': thumbnail.height,
+        'thumbnail_srcset': ', '.join(candidates),
+    }
@@ -0,0 +1,204 @@
+import threading
+from collections import defaultdict
+
+from django.db.models import F, FilteredRelation, Q
+
+from .models import (Follow, GroupSubscription, Post, TimelineEntry,
+                     UserCounters)
+from .paginators import KeysetPaginator, MergedPaginator
+from .post_settings import FANOUT_LIMIT
+
+TIMELINE_KEYSET_FIELDS = ('entry_date', 'entry_post')
+# Источник FollowPaginator, означающий материализованную ленту.
+TIMELINE = 'timeline'
+BATCH_SIZE = 500
+
+# Авторы, ленты подписчиков которых заполняются после ответа.
+_pending = threading.local()
+
+
+def followers_count(author_id):
+    return UserCounters.objects.filter(
+        user_id=author_id
+    ).values_list('followers_count', flat=True).first() or 0
+
+
+def is_celebrity(author_id):
+    """У автора столько подписчиков, что посты им не разносятся."""
+    return followers_count(author_id) > FANOUT_LIMIT
+
+
+def fanout_followers(author_id):
+    """
+    Подписчики, в ленты которых разносятся посты автора,
+    или None, если автор популярный и его посты читаются напрямую.
+    """
+    followers = list(Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)[:FANOUT_LIMIT + 1])
+    if len(followers) > FANOUT_LIMIT:
+        return None
+    return followers
+
+
+def fan_out(post):
+    """Разносит новый пост по лентам подписчиков автора."""
+    fan_out_posts(post.author_id, [(post.pk, post.pub_date)])
+
+
+def fan_out_posts(author_id, posts):
+    """Разносит по лентам подписчиков посты автора: пары (pk, pub_date)."""
+    followers = fanout_followers(author_id)
+    if not followers or not posts:
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id in followers
+            for post_id, pub_date in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_bulk(post_ids):
+    """Разносит по лентам посты из bulk_create, кроме популярных авторов."""
+    by_author = defaultdict(list)
+    posts = Post.objects.filter(
+        pk__in=post_ids
+    ).values_list('author_id', 'pk', 'pub_date')
+    for author_id, post_id, pub_date in posts:
+        by_author[author_id].append((post_id, pub_date))
+    for author_id, author_posts in by_author.items():
+        fan_out_posts(author_id, author_posts)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    entries = []
+    for post_id, pub_date in posts.iterator():
+        entries.append(TimelineEntry(
+            user_id=user_id, post_id=post_id, pub_date=pub_date
+        ))
+        if len(entries) == BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            entries = []
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def backfill_followers(author_id):
+    """
+    Заполняет ленты всех подписчиков автора, например когда он
+    перестал быть популярным. Пишет все посты автора каждому
+    подписчику, поэтому из запроса не вызывается: см. schedule_backfill.
+    """
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def schedule_backfill(author_id):
+    """
+    Откладывает заполнение лент подписчиков автора до конца запроса:
+    оно выполняется по request_finished, когда ответ уже отдан.
+    """
+    if not hasattr(_pending, 'authors'):
+        _pending.authors = set()
+    _pending.authors.add(author_id)
+
+
+def backfill_pending(**kwargs):
+    """Заполняет ленты, отложенные за время запроса."""
+    authors = getattr(_pending, 'authors', set())
+    _pending.authors = set()
+    for author_id in sorted(authors):
+        # За время запроса автор мог снова стать популярным.
+        if not is_celebrity(author_id):
+            backfill_followers(author_id)
+
+
+def trim(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def celebrity_ids(user):
+    """Авторы из подписок пользователя, чьи посты читаются напрямую."""
+    followed = Follow.objects.filter(user=user).values('author_id')
+    return list(UserCounters.objects.filter(
+        user_id__in=followed,
+        followers_count__gt=FANOUT_LIMIT
+    ).values_list('user_id', flat=True))
+
+
+def follow_feed(user):
+    """
+    Лента подписок пользователя и поля ключа для курсорной паджинации.
+    Ключ — колонки той же строки материализованной ленты, по которой
+    отобраны посты: курсор не добавляет второго соединения, и страница
+    остаётся одним проходом по индексу (user, pub_date).
+    Посты популярных авторов подмешивает FollowPaginator.
+    """
+    posts = Post.objects.for_feed().annotate(
+        entry=FilteredRelation(
+            'timeline_entries',
+            condition=Q(timeline_entries__user=user)
+        )
+    ).annotate(
+        entry_date=F('entry__pub_date'), entry_post=F('entry__post')
+    ).filter(
+        entry_date__isnull=False
+    ).order_by(F('entry_date').desc(), F('entry_post').desc())
+    return posts, TIMELINE_KEYSET_FIELDS
+
+
+class FollowPaginator(MergedPaginator):
+    """
+    Лента подписок с постами популярных авторов: материализованная
+    лента сливается с их постами как ещё один источник. Её ключи
+    берутся по индексу (user, pub_date) TimelineEntry, ключи авторов —
+    по (author, pub_date, id) постов, так что страница не сортирует
+    ни всю ленту, ни все посты авторов.
+    """
+
+    def __init__(self, user, celebrities, per_page):
+        super().__init__(
+            Post.objects.for_feed(),
+            [TIMELINE, *(Q(author_id=author) for author in celebrities)],
+            per_page,
+        )
+        self.timeline = KeysetPaginator(
+            TimelineEntry.objects.filter(user=user), per_page,
+            fields=('pub_date', 'post')
+        )
+
+    def source_keys(self, source, cursor, newer):
+        if source is not TIMELINE:
+            return super().source_keys(source, cursor, newer)
+        entries = self.timeline.object_list
+        if newer:
+            entries = self.timeline.newer_than(entries, cursor)
+        else:
+            entries = self.timeline.older_than(entries, cursor)
+        return entries.values_list('post', 'pub_date')
+
+
+def personal_feed_sources(user):
+    """Условия на посты каждого автора и сообщества из подписок."""
+    authors = Follow.objects.filter(
+        user=user
+    ).values_list('author_id', flat=True)
+    groups = GroupSubscription.objects.filter(
+        user=user
+    ).values_list('group_id', flat=True)
+    sources = [Q(author_id=author) for author in authors]
+    sources.extend(Q(group_id=group) for group in groups)
+    return sources
@@ -15,7 +15,19 @@ urlpatterns = [
         name='add_comment'
     ),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path(
+        'group/<slug:slug>/subscribe/',
+        views.group_subscribe,
+        name='group_subscribe'
+    ),
+    path(
+        'group/<slug:slug>/unsubscribe/',
+        views.group_unsubscribe,
+        name='group_unsubscribe'
+    ),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('feed/', views.personal_feed, name='personal_feed'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,24 +1,65 @@
+import hashlib
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
 
+from .cards import CARD_KEYSET_FIELDS
+from .counters import user_counters
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
-from .post_settings import PAGINATOR_SET
+from .lookups import get_group_or_404, get_post_or_404, get_user_or_404
+from .models import GroupSubscription, Post, PostCard, Follow, TimelineEntry
+from .page_cache import (cached_page, conditional_page, page_versions,
+                         user_namespace)
+from .paginators import (KEYSET_FIELDS, BoundedPaginator, KeysetPaginator,
+                         MergedPaginator)
+from .post_settings import PAGINATION_MODE, PAGINATOR_SET
+from .search import PostSearch
+from .thumbnails import schedule as schedule_thumbnails
+from .timeline import (FollowPaginator, celebrity_ids, follow_feed,
+                       personal_feed_sources)
 
 
-def pagination(request, to_pagination):
-    """Вспомогательная функция для паджинации."""
-    paginator = Paginator(to_pagination, PAGINATOR_SET)
+def pagination(request, to_pagination, count_key=None, keyset=None,
+               keyset_fields=KEYSET_FIELDS, count_queryset=None):
+    """
+    Вспомогательная функция для паджинации.
+    Курсорный режим включается настройкой POSTS_PAGINATION_MODE
+    или наличием токена ?after=/?before= в запросе.
+    count_key — имя ленты, под которым кешируется количество постов,
+    keyset_fields — поля ключа курсора для выборки,
+    count_queryset — выборка, по которой считать количество постов.
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if keyset is None:
+        keyset = (
+            PAGINATION_MODE == 'keyset'
+            or after is not None
+            or before is not None
+        )
+    if keyset:
+        paginator = KeysetPaginator(
+            to_pagination, PAGINATOR_SET, fields=keyset_fields
+        )
+        return paginator.get_page_by_cursor(after=after, before=before)
+    paginator = BoundedPaginator(
+        to_pagination, PAGINATOR_SET, count_key=count_key,
+        count_queryset=count_queryset
+    )
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+@conditional_page('index')
+@cached_page('index')
 def index(request):
     """View функция для главной страницы."""
-    posts = Post.objects.all()
-    page_obj = pagination(request, posts)
+    posts = PostCard.objects.all()
+    page_obj = pagination(
+        request, posts, count_key='index', keyset_fields=CARD_KEYSET_FIELDS
+    )
     context = {
         'page_obj': page_obj,
         'index': True,
@@ -26,11 +67,17 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page('group:{slug}')
+@cached_page('group:{slug}')
 def group_posts(request, slug):
     """View функция для страницы сообщества."""
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = pagination(request, posts)
+    group = get_group_or_404(slug)
+    posts = PostCard.objects.filter(group=group)
+    page_obj = pagination(
+        request, posts,
+        count_key=f'group:{group.pk}',
+        keyset_fields=CARD_KEYSET_FIELDS
+    )
     template = 'posts/group_list.html'
     context = {
         'group': group,
@@ -40,35 +87,41 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@conditional_page('profile:{username}')
+@cached_page('profile:{username}')
 def profile(request, username):
     """View функция для страницы профиля."""
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    count = posts.count()
-    page_obj = pagination(request, posts)
-    following = request.user.is_authenticated and (
-        Follow.objects.filter(
-            user=request.user
-        ).filter(
-            author=author
-        ).exists()
+    author = get_user_or_404(username)
+    posts = PostCard.objects.filter(author=author)
+    counters = user_counters(author)
+    page_obj = pagination(
+        request, posts,
+        count_key=f'author:{author.pk}',
+        keyset_fields=CARD_KEYSET_FIELDS
     )
     context = {
         'page_obj': page_obj,
-        'count': count,
+        'count': counters.posts_count,
+        'counters': counters,
         'author': author,
-        'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+def post_author_page(post_id):
+    """Профиль автора поста: на странице поста виден счётчик его постов."""
+    return f'profile:{get_post_or_404(post_id).author.username}'
+
+
+@conditional_page(post_author_page, 'post:{post_id}')
+@cached_page(post_author_page, 'post:{post_id}')
 def post_detail(request, post_id):
     """View функция для страницы поста."""
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = get_post_or_404(post_id)
+    comments = post.comments.select_related('author')
     form = CommentForm()
     author = post.author
-    count = author.posts.all().count()
+    count = user_counters(author).posts_count
     context = {
         'count': count,
         'author': author,
@@ -79,6 +132,19 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def search(request):
+    """View функция для полнотекстового поиска по постам."""
+    query = request.GET.get('q', '').strip()
+    paginator = BoundedPaginator(PostSearch(query), PAGINATOR_SET)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'page_params': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     """View функция для создания нового поста."""
@@ -90,6 +156,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        schedule_thumbnails(post.image)
         return redirect(
             'posts:profile', request.user.username)
     return render(request, 'posts/create_post.html', {'form': form})
@@ -107,7 +174,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnails(post.image)
         return redirect('posts:post_detail', post_id)
     return render(
         request, 'posts/create_post.html',
@@ -118,7 +187,7 @@ def post_edit(request, post_id):
 @login_required
 def add_comment(request, post_id):
     """View функция для добавления комментария."""
-    post = get_object_or_404(Post, id=post_id)
+    post = get_post_or_404(post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -128,11 +197,55 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def followed_pages(request):
+    """Пространства имён профилей авторов из подписок пользователя."""
+    pages = getattr(request, '_followed_pages', None)
+    if pages is None:
+        usernames = Follow.objects.filter(
+            user=request.user
+        ).values_list('author__username', flat=True)
+        pages = [f'profile:{username}' for username in usernames]
+        request._followed_pages = pages
+    return pages
+
+
+def follow_count_key(request):
+    """
+    Имя ленты подписок для кеша количества постов. В нём версии
+    профилей авторов из подписок и фрагментов пользователя: пост
+    автора или смена подписок дают новый ключ, и при публикации
+    не нужно сбрасывать счётчик каждого подписчика.
+    """
+    names = [user_namespace(request.user.pk), *followed_pages(request)]
+    versions = '.'.join(str(version) for version in page_versions(names))
+    digest = hashlib.md5(versions.encode()).hexdigest()
+    return f'follow:{request.user.pk}:{digest}'
+
+
 @login_required
+@conditional_page(extra=followed_pages)
 def follow_index(request):
     """View функция для ленты избранных авторов."""
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = pagination(request, posts)
+    celebrities = celebrity_ids(request.user)
+    if celebrities:
+        # Посты популярных авторов подмешиваются слиянием,
+        # у такой ленты есть только курсорные страницы.
+        paginator = FollowPaginator(
+            request.user, celebrities, PAGINATOR_SET
+        )
+        page_obj = paginator.get_page_by_cursor(
+            after=request.GET.get('after'),
+            before=request.GET.get('before')
+        )
+    else:
+        posts, keyset_fields = follow_feed(request.user)
+        # В ленте столько постов, сколько в ней строк TimelineEntry.
+        page_obj = pagination(
+            request, posts,
+            count_key=follow_count_key(request),
+            keyset_fields=keyset_fields,
+            count_queryset=TimelineEntry.objects.filter(user=request.user)
+        )
     context = {'page_obj': page_obj, 'follow': True}
     return render(request, 'posts/follow.html', context)
 
@@ -140,7 +253,7 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     """View функция для подписки на автора."""
-    user = get_object_or_404(User, username=username)
+    user = get_user_or_404(username)
     if request.user == user:
         return redirect('posts:profile', username=username)
     Follow.objects.get_or_create(user=request.user, author=user)
@@ -150,7 +263,7 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     """View функция для отписки."""
-    author = get_object_or_404(User, username=username)
+    author = get_user_or_404(username)
     follow = get_object_or_404(
         Follow,
         user=request.user,
@@ -158,3 +271,34 @@ def profile_unfollow(request, username):
     )
     follow.delete()
     return redirect('posts:profile', username=username)
+
+
+@login_required
+def personal_feed(request):
+    """View функция для личной ленты: авторы и сообщества из подписок."""
+    paginator = MergedPaginator(
+        Post.objects.for_feed(), personal_feed_sources(request.user),
+        PAGINATOR_SET
+    )
+    page_obj = paginator.get_page_by_cursor(
+        after=request.GET.get('after'),
+        before=request.GET.get('before')
+    )
+    context = {'page_obj': page_obj, 'personal': True}
+    return render(request, 'posts/personal_feed.html', context)
+
+
+@login_required
+def group_subscribe(request, slug):
+    """View функция для подписки на сообщество."""
+    group = get_group_or_404(slug)
+    GroupSubscription.objects.get_or_create(user=request.user, group=group)
+    return redirect('posts:group_posts', slug=slug)
+
+
+@login_required
+def group_unsubscribe(request, slug):
+    """View функция для отписки от сообщества."""
+    group = get_group_or_404(slug)
+    GroupSubscription.objects.filter(user=request.user, group=group).delete()
+    return redirect('posts:group_posts', slug=slug)
@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -37,6 +39,7 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PAGINATOR_SET = 10
+POSTS_PAGINATION_MODE = 'numbered'
 
 INSTALLED_APPS = [
     'core.apps.CoreConfig',
@@ -100,11 +103,24 @@ DATABASES = {
     }
 }
 
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-#     }
-# }
+# Тесты чистят кеш, поэтому работают со своим временным файлом.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+# Память процесса поверх общего для всех воркеров файла SQLite.
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.TwoTierCache',
+        'LOCATION': os.path.join(
+            tempfile.mkdtemp() if TESTING else BASE_DIR, 'cache.sqlite3'
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_MAX_BYTES': 32 * 1024 * 1024,
+        },
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -145,3 +161,12 @@ STATIC_URL = '/static/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# В продакшене файлы из MEDIA_ROOT отдаёт nginx: 'nginx' — X-Accel-Redirect
+# в internal-location MEDIA_ACCEL_PREFIX, 'apache' — X-Sendfile.
+MEDIA_SENDFILE_BACKEND = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Загрузки пишутся на диск порциями, а не собираются в памяти.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.media import MEDIA_SENDFILE_BACKEND, serve_media
 
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.permission_denied_view'
@@ -19,6 +20,11 @@ if settings.DEBUG:
     import debug_toolbar
 
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+
+if settings.DEBUG or MEDIA_SENDFILE_BACKEND:
+    urlpatterns += (
+        re_path(
+            rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.+)$",
+            serve_media, name='media'
+        ),
     )